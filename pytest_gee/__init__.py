@@ -2,23 +2,54 @@
 
 from __future__ import annotations
 
+import importlib
 import json
 import os
 import re
 from pathlib import Path
-from typing import Union
+from typing import TYPE_CHECKING, Union
 
-import ee
-import httplib2
 from deprecated.sphinx import deprecated
 
-from .utils import wait_for_task
+if TYPE_CHECKING:
+    import ee
+
+    from .utils import wait_for_task as wait_for_task
+
+# the package is imported by the pytest plugin in every test session, earthengine and the helpers
+# are only imported when they are actually used
+SUBMODULES = ("utils",)
+ATTRIBUTES = {"wait_for_task": "utils"}
+"The names imported from the submodules by the package, mapped to their submodule."
 
 __version__ = "0.8.0"
 __author__ = "Pierrick Rambaud"
 __email__ = "pierrick.rambaud49@gmail.com"
 
 
+def __getattr__(name: str):
+    """Import the submodules of the package and the names exported from them on first access."""
+    if name in SUBMODULES:
+        return importlib.import_module(f".{name}", __name__)
+    if name in ATTRIBUTES:
+        return getattr(importlib.import_module(f".{ATTRIBUTES[name]}", __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+REPLAY_PROJECT = "pytest-gee-replay"
+"The project used to initialize Earth Engine from a cassette when ``EARTHENGINE_PROJECT`` is not set."
+
+
+def _init_ee_from_cassette():
+    """Initialize earth engine from the responses recorded in the cassette, without credentials."""
+    import ee
+
+    from .transport import get_transport
+
+    project_id = os.environ.get("EARTHENGINE_PROJECT", REPLAY_PROJECT)
+    ee.Initialize(credentials=None, project=project_id, http_transport=get_transport())
+
+
 def init_ee_from_token():
     r"""Initialize earth engine according using a token.
 
@@ -31,7 +62,17 @@ def init_ee_from_token():
 
     Note:
         As all init method of pytest-gee, this method will fallback to a regular ``ee.Initialize()`` if the environment variable is not found e.g. on your local computer.
+        With ``--gee-replay`` the API is initialized offline from the cassette, without credentials.
     """
+    import ee
+
+    from .transport import get_transport, is_replaying
+    from .utils import share_access_token, write_if_changed
+
+    if is_replaying():
+        return _init_ee_from_cassette()
+
+    credentials = "persistent"
     if "EARTHENGINE_TOKEN" in os.environ:
         # read the ee_token from the environment variable
         ee_token = os.environ["EARTHENGINE_TOKEN"]
@@ -42,11 +83,14 @@ def init_ee_from_token():
         pattern = re.compile(r"^'[^']*'$")
         ee_token = ee_token[1:-1] if pattern.match(ee_token) else ee_token
 
-        # write the token to the appropriate folder
+        # write the token to the appropriate folder, the file is shared by all the test processes
         credential_folder_path = Path.home() / ".config" / "earthengine"
         credential_folder_path.mkdir(parents=True, exist_ok=True)
         credential_file_path = credential_folder_path / "credentials"
-        credential_file_path.write_text(ee_token)
+        write_if_changed(credential_file_path, ee_token)
+
+        # reuse the access token refreshed by another test process if any
+        credentials = share_access_token(ee.data.get_persistent_credentials(), ee_token)
 
     project_id = os.environ.get("EARTHENGINE_PROJECT", ee.data._cloud_api_user_project)
     if project_id is None:
@@ -57,7 +101,7 @@ def init_ee_from_token():
 
     # if the user is in local development the authentication should
     # already be available
-    ee.Initialize(project=project_id, http_transport=httplib2.Http())
+    ee.Initialize(credentials=credentials, project=project_id, http_transport=get_transport())
 
 
 def init_ee_from_service_account():
@@ -68,7 +112,16 @@ def init_ee_from_service_account():
 
     Note:
         As all init method of ``pytest-gee``, this method will fallback to a regular ``ee.Initialize`` using the ``EARTHENGINE_PROJECT`` environment variable.
+        With ``--gee-replay`` the API is initialized offline from the cassette, without credentials.
     """
+    import ee
+
+    from .transport import get_transport, is_replaying
+    from .utils import share_access_token
+
+    if is_replaying():
+        return _init_ee_from_cassette()
+
     if "EARTHENGINE_SERVICE_ACCOUNT" in os.environ:
         # extract the environment variables data
         private_key = os.environ["EARTHENGINE_SERVICE_ACCOUNT"]
@@ -83,14 +136,17 @@ def init_ee_from_service_account():
         # private key data
         ee_user = json.loads(private_key)["client_email"]
         credentials = ee.ServiceAccountCredentials(ee_user, key_data=private_key)
+        credentials = share_access_token(credentials, private_key)
         ee.Initialize(
-            credentials=credentials, project=credentials.project_id, http_transport=httplib2.Http()
+            credentials=credentials,
+            project=credentials.project_id,
+            http_transport=get_transport(),
         )
 
     elif "EARTHENGINE_PROJECT" in os.environ:
         # if the user is in local development the authentication should already be available
         # we simply need to use the provided project name
-        ee.Initialize(project=os.environ["EARTHENGINE_PROJECT"], http_transport=httplib2.Http())
+        ee.Initialize(project=os.environ["EARTHENGINE_PROJECT"], http_transport=get_transport())
 
     else:
         msg = "EARTHENGINE_SERVICE_ACCOUNT or EARTHENGINE_PROJECT environment variable is missing"
@@ -108,6 +164,10 @@ def wait(task: Union[ee.batch.Task, str], timeout: int = 5 * 60) -> str:
     Returns:
         the final state of the task
     """
+    import ee
+
+    from .utils import wait_for_task
+
     # just expose the utils function
     # this is compulsory as wait is also needed in the utils module
     task_id = task.id if isinstance(task, ee.batch.Task) else task
@@ -0,0 +1,185 @@
+"""Implementation of the ``array_regression`` fixture."""
+
+import os
+from contextlib import suppress
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Union, cast
+
+import ee
+import numpy as np
+from pytest import fail
+from pytest_regressions.common import perform_regression_check
+
+from .cassette import CASSETTE_KEY
+from .deferred import DeferrableFixture
+from .utils import SerializedGraph, build_fullpath, check_serialized, delete_serialized
+
+if TYPE_CHECKING:
+    from pytest_datadir.plugin import LazyDataDir
+
+
+class ArrayFixture(DeferrableFixture):
+    """Fixture for regression testing of the pixel values of :py:class:`ee.Image`."""
+
+    def __init__(self, datadir: Path, original_datadir: Path, request):
+        """Create the fixture.
+
+        Args:
+            datadir: The directory where the data files are stored.
+            original_datadir: The original data directory.
+            request: The pytest request object.
+        """
+        super().__init__()
+        self.datadir = datadir
+        self.original_datadir = original_datadir
+        self.request = request
+        self.force_regen = False
+        self.with_test_class_names = False
+
+    def check(
+        self,
+        data_image: ee.Image,
+        basename: Optional[str] = None,
+        fullpath: Optional[os.PathLike] = None,
+        scale: Optional[int] = 30,
+        region: Optional[Union[ee.FeatureCollection, ee.Feature, ee.Geometry]] = None,
+        rtol: float = 1e-7,
+        atol: float = 0.0,
+        tolerances: Optional[Dict[str, Dict[str, float]]] = None,
+    ):
+        """Check the pixel values of the given image against a previously recorded version, or generate a new file.
+
+        The raw band values are computed on the fly using earthengine and stored as a NumPy structured array
+        with one field per band. Like for the image regression the test must be reasonable in size and scale.
+
+        Parameters:
+            data_image: The image to check. The image needs to be clipped to a geometry or have an existing footprint.
+            basename: The basename of the file to test/record. If not given the name of the test is used.
+            fullpath: complete path to use as a reference file. This option will ignore ``datadir`` fixture when reading *expected* files but will still use it to write *obtained* files. Useful if a reference file is located in the session data dir for example.
+            scale: The scale to use for the pixel grid.
+            region: The region to use for clipping the image. If not given, the image's region will be used.
+            rtol: The relative tolerance used for the bands without specific tolerances.
+            atol: The absolute tolerance used for the bands without specific tolerances.
+            tolerances: The ``rtol`` and ``atol`` of specific bands, for example ``{"B4": {"atol": 1}}``.
+        """
+        # rescale the original image, the casts are needed as mypy cannot narrow the Earth Engine
+        # types with isinstance
+        if isinstance(region, ee.Geometry):
+            geometry = cast(ee.Geometry, region)
+        else:
+            element = data_image if region is None else region
+            geometry = cast(Union[ee.Image, ee.FeatureCollection, ee.Feature], element).geometry()
+        data_image = data_image.clipToBoundsAndScale(geometry, scale=scale)
+
+        # build the different filename to be consistent between our 3 checks
+        data_name = build_fullpath(
+            datadir=self.original_datadir,
+            request=self.request,
+            extension=".npy",
+            basename=basename,
+            fullpath=fullpath,
+            with_test_class_names=self.with_test_class_names,
+        )
+        serialized_name = data_name.with_stem(f"serialized_{data_name.stem}").with_suffix(".yml")
+
+        # check the previously registered serialized call from GEE. If it matches the current call,
+        # we don't need to check the data
+        graph = SerializedGraph(data_image)
+        with suppress(AssertionError, fail.Exception):
+            check_serialized(object=graph, path=serialized_name, request=self.request)
+            return
+
+        # delete the previously created file if wasn't successful
+        delete_serialized(serialized_name, self.request)
+
+        # responses can be served from the cassette in record/replay mode
+        cassette = self.request.config.stash[CASSETTE_KEY]
+
+        def fetch() -> bytes:
+            # the raw NPY file is kept as is so that it can be written as the reference file
+            def get_npy() -> bytes:
+                return ee.data.computePixels({"expression": data_image, "fileFormat": "NPY"})
+
+            return cassette.fetch(data_image, get_npy, kind="npy", digest=graph.digest)
+
+        def compare(byte_data: bytes):
+            def check_fn(obtained_filename: Path, expected_filename: Path):
+                obtained = np.load(obtained_filename, mmap_mode="r")
+                expected = np.load(expected_filename, mmap_mode="r")
+                compare_arrays(obtained, expected, rtol, atol, tolerances)
+
+            def dump_fn(filename: Path):
+                filename.write_bytes(byte_data)
+
+            # both a Path and the LazyDataDir of the recent pytest-regressions are joined with "/"
+            perform_regression_check(
+                datadir=cast("LazyDataDir", self.datadir),
+                original_datadir=self.original_datadir,
+                request=self.request,
+                check_fn=check_fn,
+                dump_fn=dump_fn,
+                extension=".npy",
+                fullpath=data_name,
+                force_regen=self.force_regen,
+                with_test_class_names=self.with_test_class_names,
+            )
+
+            # IF we are here it means the data has been modified so we edit the API call accordingly
+            # to make sure next run will not be forced to call the API for a response.
+            check_serialized(
+                object=graph, path=serialized_name, request=self.request, force_regen=True
+            )
+
+        # the data is fetched now or in the thread pool
+        self._dispatch(data_image, compare, fetch)
+
+
+def compare_arrays(
+    obtained: np.ndarray,
+    expected: np.ndarray,
+    rtol: float = 1e-7,
+    atol: float = 0.0,
+    tolerances: Optional[Dict[str, Dict[str, float]]] = None,
+):
+    """Compare 2 structured arrays band by band.
+
+    Args:
+        obtained: the obtained pixel values, with one field per band.
+        expected: the expected pixel values, with one field per band.
+        rtol: the relative tolerance used for the bands without specific tolerances.
+        atol: the absolute tolerance used for the bands without specific tolerances.
+        tolerances: the ``rtol`` and ``atol`` of specific bands.
+
+    Raises:
+        AssertionError: if the bands, the shapes or the values differ.
+    """
+    tolerances = tolerances or {}
+    obtained_bands, expected_bands = obtained.dtype.names or (), expected.dtype.names or ()
+    if obtained_bands != expected_bands:
+        raise AssertionError(
+            f"The bands differ from the expected ones: {list(obtained_bands)} != {list(expected_bands)}.\n"
+            "To update values, use --force-regen option."
+        )
+    if obtained.shape != expected.shape:
+        raise AssertionError(
+            f"The shape differs from the expected one: {obtained.shape} != {expected.shape}.\n"
+            "To update values, use --force-regen option."
+        )
+
+    errors: List[str] = []
+    for band in obtained_bands:
+        tolerance = {"rtol": rtol, "atol": atol, **tolerances.get(band, {})}
+        obtained_band, expected_band = obtained[band], expected[band]
+        close = np.isclose(obtained_band, expected_band, equal_nan=True, **tolerance)
+        if not close.all():
+            diff = np.abs(obtained_band.astype(float) - expected_band.astype(float))[~close]
+            errors.append(
+                f"{band}: {(~close).sum()} of {close.size} pixels differ, max difference {diff.max()}"
+            )
+
+    if errors:
+        raise AssertionError(
+            "The pixel values differ from the expected ones:\n"
+            + "\n".join(errors)
+            + "\nTo update values, use --force-regen option."
+        )
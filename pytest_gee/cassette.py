@@ -0,0 +1,191 @@
+"""Record and replay of the Earth Engine responses used by the regression fixtures.
+
+A cassette is a folder where every response is stored in a file named after the digest of the
+canonical serialized request. In ``record`` mode the responses are fetched from Earth Engine and
+saved, in ``replay`` mode they are only read from the disk and no network call is made.
+
+The responses of the requests made by ``ee.Initialize`` are recorded by the transport as well so
+that the API can be initialized without credentials nor network access in ``replay`` mode.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+from pytest import StashKey, fail
+
+if TYPE_CHECKING:
+    import ee
+
+MODES = ("record", "replay")
+"The available cassette modes."
+
+MISSING = object()
+"The value returned by :py:meth:`Cassette.load` for the requests that were never recorded."
+
+INIT_REQUESTS = (r"/\$discovery/rest$", r"/algorithms$")
+"The url paths of the requests made by ``ee.Initialize``, recorded to initialize the API offline."
+
+
+class Cassette:
+    """Store of Earth Engine responses keyed by the digest of the serialized request."""
+
+    def __init__(self, path: Path, mode: Optional[str] = None):
+        """Create the cassette.
+
+        Args:
+            path: the folder where the responses are stored.
+            mode: ``"record"`` to save the responses, ``"replay"`` to serve them from the disk, ``None`` to disable the cassette.
+        """
+        if mode not in (*MODES, None):
+            raise ValueError(f"Cassette mode should be one of {MODES}, got {mode}.")
+        self.path = Path(path)
+        self.mode = mode
+
+    def key(
+        self, object: ee.ComputedObject, kind: str = "value", digest: Optional[str] = None
+    ) -> str:
+        """Compute the key of a request.
+
+        Args:
+            object: the requested object.
+            kind: the kind of request made on the object, for example ``"value"`` or ``"thumbnail"``.
+            digest: the digest of the :py:class:`~pytest_gee.utils.SerializedGraph` of the object, computed if not given.
+
+        Returns:
+            the sha256 digest of the request
+        """
+        if digest is None:
+            from .utils import SerializedGraph
+
+            digest = SerializedGraph(object).digest
+        return hashlib.sha256(f"{kind}\n{digest}".encode()).hexdigest()
+
+    def _file(self, key: str, suffix: str) -> Path:
+        """Get the file of a response in the cassette."""
+        return self.path / key[:2] / f"{key}{suffix}"
+
+    def records(self, uri: str) -> bool:
+        """Whether the response of an HTTP request is kept in the cassette by the transport.
+
+        Args:
+            uri: the requested url.
+
+        Returns:
+            True for the requests of the initialization when the cassette is enabled.
+        """
+        path = urlsplit(uri).path
+        return self.mode is not None and any(re.search(p, path) for p in INIT_REQUESTS)
+
+    def fetch_request(
+        self, method: str, uri: str, fn: Callable[[], Tuple[int, Dict[str, str], bytes]]
+    ) -> Tuple[int, Dict[str, str], bytes]:
+        """Get the response of an HTTP request from the cassette or from Earth Engine.
+
+        The project of the url is not part of the key so that the recorded initialization can be
+        replayed with any project.
+
+        Args:
+            method: the HTTP method.
+            uri: the requested url.
+            fn: the function sending the request, it returns the status, the headers and the content.
+
+        Returns:
+            the status, the headers and the content of the response.
+        """
+        if self.mode is None:
+            return fn()
+
+        request = re.sub(r"/projects/[^/]+/", "/projects/-/", uri)
+        key = hashlib.sha256(f"request\n{method} {request}".encode()).hexdigest()
+        meta_file, content_file = self._file(key, ".json"), self._file(key, ".bin")
+
+        if self.mode == "replay":
+            if not meta_file.exists():
+                raise RuntimeError(
+                    f"No recorded response for {method} {request} in {self.path}, run with --gee-record."
+                )
+            meta = json.loads(meta_file.read_text())
+            return meta["status"], meta["headers"], content_file.read_bytes()
+
+        status, headers, content = fn()
+        if status == 200:
+            headers = {k: v for k, v in headers.items() if k.lower() == "content-type"}
+            meta_file.parent.mkdir(parents=True, exist_ok=True)
+            content_file.write_bytes(content)
+            meta_file.write_text(json.dumps({"status": status, "headers": headers}))
+
+        return status, headers, content
+
+    def fetch(
+        self,
+        object: ee.ComputedObject,
+        fn: Callable[[], Any],
+        kind: str = "value",
+        digest: Optional[str] = None,
+    ) -> Any:
+        """Get the response of a request from the cassette or from Earth Engine.
+
+        Args:
+            object: the requested object.
+            fn: the function making the actual request. It should return a JSON serializable object or bytes.
+            kind: the kind of request made on the object, for example ``"value"`` or ``"thumbnail"``.
+            digest: the digest of the serialized graph of the object, see :py:meth:`key`.
+
+        Returns:
+            the response of the request
+        """
+        if self.mode is None:
+            return fn()
+
+        key = self.key(object, kind, digest)
+        if self.mode == "replay":
+            response = self.load(key)
+            if response is MISSING:
+                fail(
+                    f"No recorded {kind} response for this request in {self.path}, run with --gee-record."
+                )
+            return response
+
+        response = fn()
+        self.save(key, response)
+        return response
+
+    def load(self, key: str) -> Any:
+        """Read a recorded response.
+
+        Args:
+            key: the key of the request, see :py:meth:`key`.
+
+        Returns:
+            the recorded response or ``MISSING`` if the request was never recorded.
+        """
+        json_file, bytes_file = self._file(key, ".json"), self._file(key, ".bin")
+        if json_file.exists():
+            return json.loads(json_file.read_text())
+        if bytes_file.exists():
+            return bytes_file.read_bytes()
+        return MISSING
+
+    def save(self, key: str, response: Any):
+        """Record a response.
+
+        Args:
+            key: the key of the request, see :py:meth:`key`.
+            response: the response, a JSON serializable object or bytes.
+        """
+        json_file = self._file(key, ".json")
+        json_file.parent.mkdir(parents=True, exist_ok=True)
+        if isinstance(response, bytes):
+            json_file.with_suffix(".bin").write_bytes(response)
+        else:
+            json_file.write_text(json.dumps(response, sort_keys=True))
+
+
+CASSETTE_KEY = StashKey[Cassette]()
+"The cassette recording or replaying the Earth Engine responses of the session."
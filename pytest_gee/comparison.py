@@ -0,0 +1,366 @@
+"""Tolerance based comparison of the data fetched by the regression fixtures.
+
+The nested lists and dictionaries are flattened into a mapping from the path of each value to the
+value itself. The numeric values found at the same paths are compared at once with
+:py:func:`numpy.isclose` and only the mismatching paths are reported.
+
+Feature collections are compared as GeoDataFrames: the geometries with the vectorized shapely
+predicates and the properties column by column.
+"""
+
+from __future__ import annotations
+
+from itertools import zip_longest
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+import yaml
+from pytest_regressions.common import perform_regression_check
+from pytest_regressions.data_regression import DataRegressionFixture, RegressionYamlDumper
+
+from .utils import round_data
+
+MAX_REPORTED_PATHS = 50
+"The maximum number of mismatching paths listed in a failure message."
+
+FEATURE_FORMATS = ("yml", "parquet")
+"The available formats of the feature collection reference files."
+
+YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+"The fastest safe yaml loader available, the reference files can be large."
+
+
+def flatten_data(data: Any, path: str = "") -> Dict[str, Any]:
+    """Flatten nested lists and dictionaries.
+
+    Empty containers are kept as values so that ``[]`` and ``{}`` are still compared.
+
+    Args:
+        data: the data to flatten.
+        path: the path of the data in the parent container.
+
+    Returns:
+        the values of the data keyed by their path, for example ``/features/0/id``.
+    """
+    items: Iterable[Tuple[Any, Any]]
+    if isinstance(data, dict) and data:
+        items = data.items()
+    elif isinstance(data, list) and data:
+        items = enumerate(data)
+    else:
+        return {path: data}
+
+    flat: Dict[str, Any] = {}
+    for key, value in items:
+        flat.update(flatten_data(value, f"{path}/{key}"))
+    return flat
+
+
+def _is_number(value: Any) -> bool:
+    """Check if a value is an int or a float but not a bool."""
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def compare_data(
+    obtained: Dict[str, Any], expected: Dict[str, Any], rtol: float = 0.0, atol: float = 0.0
+) -> List[str]:
+    """Compare flattened data.
+
+    Args:
+        obtained: the obtained values keyed by path.
+        expected: the expected values keyed by path.
+        rtol: the relative tolerance of the numeric values.
+        atol: the absolute tolerance of the numeric values.
+
+    Returns:
+        the description of every mismatching path, empty if the data are equal.
+    """
+    errors = [f"{p}: missing from the obtained data" for p in expected if p not in obtained]
+    errors += [f"{p}: not in the expected data" for p in obtained if p not in expected]
+
+    # compare all the numbers at once and the other values one by one
+    common = [p for p in obtained if p in expected]
+    numeric = [p for p in common if _is_number(obtained[p]) and _is_number(expected[p])]
+    if numeric:
+        obtained_values = np.array([obtained[p] for p in numeric], dtype=float)
+        expected_values = np.array([expected[p] for p in numeric], dtype=float)
+        close = np.isclose(obtained_values, expected_values, rtol=rtol, atol=atol, equal_nan=True)
+        errors += [
+            f"{numeric[i]}: {obtained[numeric[i]]} != {expected[numeric[i]]}"
+            for i in np.flatnonzero(~close)
+        ]
+
+    numeric_paths = set(numeric)
+    errors += [
+        f"{p}: {obtained[p]!r} != {expected[p]!r}"
+        for p in common
+        if p not in numeric_paths and obtained[p] != expected[p]
+    ]
+
+    return errors
+
+
+def check_data(
+    fixture: DataRegressionFixture,
+    data: Any,
+    fullpath: Path,
+    prescision: int = 6,
+    rtol: Optional[float] = None,
+    atol: Optional[float] = None,
+):
+    """Check data against a yaml reference file with numeric tolerances.
+
+    The reference file is written with the values rounded to ``prescision`` decimal places like the
+    ``data_regression`` fixture would. The comparison is made on the unrounded data.
+
+    Args:
+        fixture: the regression fixture making the check.
+        data: the fetched data.
+        fullpath: the path of the reference file.
+        prescision: the number of decimal places kept in the reference file.
+        rtol: the relative tolerance of the numeric values, 0 by default.
+        atol: the absolute tolerance of the numeric values, one unit of the last kept decimal place by default.
+
+    Raises:
+        AssertionError: if the data differ from the reference file.
+    """
+    __tracebackhide__ = True
+    rtol = 0.0 if rtol is None else rtol
+    atol = 10 ** (-prescision) if atol is None else atol
+    obtained = flatten_data(data)
+
+    def dump(filename: Path):
+        # the rounding is done in place, the obtained values are already flattened
+        dumped = yaml.dump_all(
+            [round_data(data, prescision)],
+            Dumper=RegressionYamlDumper,
+            default_flow_style=False,
+            allow_unicode=True,
+            indent=2,
+            encoding="utf-8",
+        )
+        Path(filename).write_bytes(dumped)
+
+    def check_fn(obtained_filename: Path, expected_filename: Path):
+        __tracebackhide__ = True
+        expected = yaml.load(Path(expected_filename).read_text(encoding="utf-8"), YamlLoader)
+        errors = compare_data(obtained, flatten_data(expected), rtol, atol)
+        _raise_errors(errors, obtained_filename, expected_filename)
+
+    _perform_check(fixture, fullpath, dump, check_fn)
+
+
+def compare_features(
+    obtained: gpd.GeoDataFrame,
+    expected: gpd.GeoDataFrame,
+    rtol: float = 0.0,
+    atol: float = 0.0,
+    hausdorff: Optional[float] = None,
+) -> List[str]:
+    """Compare the features of 2 GeoDataFrames.
+
+    The geometries are compared at once with :py:func:`shapely.equals_exact` using ``atol`` as
+    tolerance, or with a bound on their :py:func:`shapely.hausdorff_distance`. The properties are
+    compared column by column, with tolerances for the numeric columns.
+
+    Args:
+        obtained: the obtained features, indexed by their id.
+        expected: the expected features, indexed by their id.
+        rtol: the relative tolerance of the numeric properties.
+        atol: the absolute tolerance of the numeric properties and of the coordinates.
+        hausdorff: if set, the maximum Hausdorff distance between 2 matching geometries.
+
+    Returns:
+        the description of every mismatching feature path, empty if the features are equal.
+    """
+    if not obtained.index.equals(expected.index):
+        return [f"/features: the ids differ, {list(obtained.index)} != {list(expected.index)}"]
+
+    ids = list(obtained.index)
+    errors: List[str] = []
+
+    # geometries
+    a, b = obtained.geometry.values, expected.geometry.values
+    if hausdorff is None:
+        # snapped coordinates one grid step apart should pass with atol set to that step, allow
+        # for the floating point error of the snapping
+        same = shapely.equals_exact(a, b, tolerance=atol * (1 + 1e-9))
+    else:
+        same = shapely.hausdorff_distance(a, b) <= hausdorff
+    same |= shapely.is_missing(a) & shapely.is_missing(b)
+    errors += [
+        f"/features/{ids[i]}/geometry: {_short(a[i])} != {_short(b[i])}"
+        for i in np.flatnonzero(~np.asarray(same))
+    ]
+
+    # properties
+    obtained_columns = set(obtained.columns) - {obtained.geometry.name}
+    expected_columns = set(expected.columns) - {expected.geometry.name}
+    for column in sorted(expected_columns - obtained_columns):
+        errors.append(f"/features/properties/{column}: missing from the obtained data")
+    for column in sorted(obtained_columns - expected_columns):
+        errors.append(f"/features/properties/{column}: not in the expected data")
+
+    for column in sorted(obtained_columns & expected_columns):
+        o, e = obtained[column], expected[column]
+        numeric = all(
+            pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s) for s in (o, e)
+        )
+        if numeric:
+            o_values, e_values = o.to_numpy(dtype=float), e.to_numpy(dtype=float)
+            same = np.isclose(o_values, e_values, rtol=rtol, atol=atol, equal_nan=True)
+        else:
+            o_values, e_values = o.to_numpy(dtype=object), e.to_numpy(dtype=object)
+            same = np.array([x == y for x, y in zip(o_values, e_values)], dtype=bool)
+            same |= pd.isna(o).to_numpy() & pd.isna(e).to_numpy()
+        o_list, e_list = o_values.tolist(), e_values.tolist()
+        errors += [
+            f"/features/{ids[i]}/properties/{column}: {o_list[i]!r} != {e_list[i]!r}"
+            for i in np.flatnonzero(~same)
+        ]
+
+    return errors
+
+
+def check_features(
+    fixture: DataRegressionFixture,
+    gdf: gpd.GeoDataFrame,
+    fullpath: Path,
+    prescision: int = 6,
+    rtol: Optional[float] = None,
+    atol: Optional[float] = None,
+    hausdorff: Optional[float] = None,
+    format: str = "yml",
+):
+    """Check features against a GeoJSON yaml or a GeoParquet reference file with tolerances.
+
+    The yaml reference file is written like :py:func:`check_data` would write the GeoJSON of the
+    features. The GeoParquet file stores the same rounded values in columns. In both cases the
+    comparison is made on the GeoDataFrames, see :py:func:`compare_features`.
+
+    Args:
+        fixture: the regression fixture making the check.
+        gdf: the fetched features, with their geometries already snapped to ``prescision``.
+        fullpath: the path of the reference file.
+        prescision: the number of decimal places kept in the reference file.
+        rtol: the relative tolerance of the numeric properties, 0 by default.
+        atol: the absolute tolerance of the numeric properties and of the coordinates, one unit of the last kept decimal place by default.
+        hausdorff: if set, the maximum Hausdorff distance between 2 matching geometries.
+        format: the format of the reference file, ``"yml"`` or ``"parquet"``.
+
+    Raises:
+        AssertionError: if the features differ from the reference file.
+    """
+    __tracebackhide__ = True
+    if format not in FEATURE_FORMATS:
+        raise ValueError(f"format should be one of {FEATURE_FORMATS}, got {format}.")
+    rtol = 0.0 if rtol is None else rtol
+    atol = 10 ** (-prescision) if atol is None else atol
+    obtained_gdf = gdf.set_axis(gdf.index.astype(str))
+
+    if format == "parquet":
+
+        def dump_parquet(filename: Path):
+            obtained_gdf.round(prescision).to_parquet(filename)
+
+        def check_parquet(obtained_filename: Path, expected_filename: Path):
+            __tracebackhide__ = True
+            expected_gdf = gpd.read_parquet(expected_filename)
+            errors = compare_features(obtained_gdf, expected_gdf, rtol, atol, hausdorff)
+            _raise_errors(errors, obtained_filename, expected_filename)
+
+        _perform_check(fixture, fullpath, dump_parquet, check_parquet)
+        return
+
+    def dump(filename: Path):
+        dumped = yaml.dump_all(
+            [round_data(gdf.to_geo_dict(), prescision)],
+            Dumper=RegressionYamlDumper,
+            default_flow_style=False,
+            allow_unicode=True,
+            indent=2,
+            encoding="utf-8",
+        )
+        Path(filename).write_bytes(dumped)
+
+    def check_fn(obtained_filename: Path, expected_filename: Path):
+        __tracebackhide__ = True
+        expected = yaml.load(Path(expected_filename).read_text(encoding="utf-8"), YamlLoader)
+        expected_gdf = gpd.GeoDataFrame.from_features(expected)
+        expected_gdf.index = pd.Index([f.get("id") for f in expected["features"]])
+        errors = compare_features(obtained_gdf, expected_gdf, rtol, atol, hausdorff)
+        _raise_errors(errors, obtained_filename, expected_filename)
+
+    _perform_check(fixture, fullpath, dump, check_fn)
+
+
+def _short(geometry: Any, length: int = 60) -> str:
+    """Shorten the WKT of a geometry for the failure messages."""
+    wkt = str(geometry)
+    return wkt if len(wkt) <= length else f"{wkt[:length]}..."
+
+
+def _raise_errors(errors: List[str], obtained_filename: Path, expected_filename: Path):
+    """Raise the mismatching paths found by a comparison, if any."""
+    __tracebackhide__ = True
+    if errors:
+        listed = errors[:MAX_REPORTED_PATHS]
+        if len(errors) > len(listed):
+            listed.append(f"... and {len(errors) - len(listed)} more")
+        raise AssertionError(
+            f"The obtained data differ from {expected_filename} at {len(errors)} path(s):\n"
+            + "\n".join(listed)
+            + f"\nThe obtained data are in {obtained_filename}.\n"
+            + "To update values, use --force-regen option."
+        )
+
+
+def check_text_lines(obtained_filename: Path, expected_filename: Path):
+    """Compare two text files line by line, stopping at the first difference.
+
+    Unlike :py:func:`pytest_regressions.common.check_text_files` the files are read as streams, the
+    reference files of the paginated feature collections can be too large to be loaded and diffed.
+
+    Args:
+        obtained_filename: the file written by the test.
+        expected_filename: the reference file.
+    """
+    __tracebackhide__ = True
+    with (
+        open(obtained_filename, encoding="utf-8") as obtained,
+        open(expected_filename, encoding="utf-8") as expected,
+    ):
+        for number, lines in enumerate(zip_longest(obtained, expected), 1):
+            if lines[0] != lines[1]:
+                line, reference = (repr(t) if t is not None else "end of file" for t in lines)
+                raise AssertionError(
+                    f"The obtained file differs from {expected_filename} at line {number}:\n"
+                    + f"expected: {reference}\nobtained: {line}\n"
+                    + f"The obtained data are in {obtained_filename}.\n"
+                    + "To update values, use --force-regen option."
+                )
+
+
+def _perform_check(
+    fixture: DataRegressionFixture,
+    fullpath: Path,
+    dump: Callable[[Path], None],
+    check_fn: Callable[[Path, Path], None],
+):
+    """Run the regression check of a fixture with the reference file found at ``fullpath``."""
+    __tracebackhide__ = True
+    perform_regression_check(
+        datadir=fixture.datadir,
+        original_datadir=fixture.original_datadir,
+        request=fixture.request,
+        check_fn=check_fn,
+        dump_fn=dump,
+        extension=Path(fullpath).suffix,
+        fullpath=fullpath,
+        force_regen=fixture.force_regen,
+        with_test_class_names=fixture.with_test_class_names,
+    )
@@ -0,0 +1,289 @@
+"""Deferred and asynchronous evaluation of the regression checks.
+
+In deferred mode the ``check`` method of the list, dictionary and feature collection fixtures only
+registers the object to fetch. The pending objects of several tests are then fetched together in a
+single :py:class:`ee.List` request and compared with their reference files. The reports of the tests
+are held until their checks are resolved so that every failure is attributed to the right test.
+
+The ``check_async`` method of every fixture fetches the data in a thread pool shared by the session
+so that the latency of several checks of the same test overlaps. The comparisons are made when the
+test ends and their failures are reported on its call, like the deferred checks.
+"""
+
+from __future__ import annotations
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import suppress
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Set, Tuple
+
+import pytest
+from pytest import fail
+
+from .cassette import CASSETTE_KEY, MISSING
+from .instrumentation import get_recorder
+
+if TYPE_CHECKING:
+    import ee
+
+    from .utils import SerializedGraph
+
+MAX_BATCH_BYTES = 5_000_000
+"The maximum size of the serialized objects fetched in a single request."
+
+
+class DeferredBatch:
+    """The checks waiting for their data to be fetched and the reports of their tests."""
+
+    def __init__(self, max_size: int = 100):
+        """Create an empty batch.
+
+        Args:
+            max_size: the number of pending checks after which the batch is resolved.
+        """
+        self.max_size = max_size
+        self.checks: List[
+            Tuple[str, ee.ComputedObject, Callable[[Any], None], Optional[SerializedGraph]]
+        ] = []
+        self.failures: Dict[str, List[BaseException]] = {}
+        self.nodeids: Set[str] = set()
+        self.held: List[Tuple[pytest.Item, List[pytest.TestReport]]] = []
+
+    def add(
+        self,
+        nodeid: str,
+        object: ee.ComputedObject,
+        compare: Callable[[Any], None],
+        graph: Optional[SerializedGraph] = None,
+    ):
+        """Register a check.
+
+        Args:
+            nodeid: the id of the test making the check.
+            object: the object to fetch.
+            compare: the function comparing the fetched data with the reference file.
+            graph: the serialized graph of the object, serialized when the batch is resolved if not given.
+        """
+        self.checks.append((nodeid, object, compare, graph))
+        self.nodeids.add(nodeid)
+
+    def is_full(self) -> bool:
+        """Whether the batch should be resolved."""
+        return len(self.checks) >= self.max_size
+
+    def resolve(self, config: pytest.Config):
+        """Fetch all the pending objects and run their comparisons.
+
+        The objects are split in chunks respecting ``MAX_BATCH_BYTES`` and each chunk is fetched in a
+        single request. If a chunk fails, its objects are fetched one by one to find the culprit. In
+        replay mode every object is read from the cassette under its own key.
+
+        Args:
+            config: the pytest config of the session.
+        """
+        import ee
+
+        from .utils import SerializedGraph
+
+        cassette = config.stash[CASSETTE_KEY]
+        recorder = get_recorder()
+
+        # the checks are taken at once so that an error cannot leave them to the next resolution
+        checks, self.checks = self.checks, []
+
+        # split the checks in chunks of limited payload, each object is serialized once for the
+        # size of its chunk and its cassette key
+        chunks: List[list] = [[]]
+        size = 0
+        for nodeid, object, compare, graph in checks:
+            try:
+                graph = graph or SerializedGraph(object)
+            except Exception as e:
+                self.failures.setdefault(nodeid, []).append(e)
+                continue
+            if chunks[-1] and size + graph.size > MAX_BATCH_BYTES:
+                chunks.append([])
+                size = 0
+            chunks[-1].append((nodeid, object, compare, graph.digest))
+            size += graph.size
+
+        for chunk in chunks:
+            # each object is recorded under its own key so that any selection of tests can be
+            # replayed, only the objects without a recording are requested from Earth Engine
+            responses: Dict[int, Any] = {}
+            keys = [cassette.key(object, digest=digest) for _, object, _, digest in chunk]
+            if cassette.mode == "replay":
+                responses = {i: cassette.load(key) for i, key in enumerate(keys)}
+                responses = {i: r for i, r in responses.items() if r is not MISSING}
+
+            # the batch request is shared by the tests of its checks, if it fails the objects are
+            # fetched one by one below
+            missing = [i for i in range(len(chunk)) if i not in responses]
+            if missing and cassette.mode != "replay":
+                nodeids = [chunk[i][0] for i in missing]
+                with suppress(Exception), recorder.attribute(*nodeids):
+                    batch = ee.List([chunk[i][1] for i in missing])
+                    responses.update(zip(missing, batch.getInfo() or []))
+                    if cassette.mode == "record":
+                        for i in missing:
+                            cassette.save(keys[i], responses[i])
+
+            for i, (nodeid, object, compare, digest) in enumerate(chunk):
+                try:
+                    with recorder.attribute(nodeid):
+                        data = responses.get(i, MISSING)
+                        if data is MISSING:
+                            data = cassette.fetch(object, object.getInfo, digest=digest)
+                        compare(data)
+                except (Exception, fail.Exception) as e:
+                    self.failures.setdefault(nodeid, []).append(e)
+
+    def release(self) -> List[Tuple[pytest.Item, List[pytest.TestReport]]]:
+        """Release the held reports once their checks are resolved.
+
+        The ``call`` report of every test with a failed check is marked as failed.
+
+        Returns:
+            the held items and their reports, ready to be logged.
+        """
+        held, self.held = self.held, []
+        for item, reports in held:
+            failures = self.failures.pop(item.nodeid, [])
+            self.nodeids.discard(item.nodeid)
+            for report in reports:
+                if failures and report.when == "call" and report.passed:
+                    report.outcome = "failed"
+                    report.longrepr = "\n\n".join(str(e) for e in failures)
+        return held
+
+
+DEFERRED_KEY = pytest.StashKey[DeferredBatch]()
+"The batch of deferred checks of the session, only set in deferred mode."
+
+
+EXECUTOR_KEY = pytest.StashKey[ThreadPoolExecutor]()
+"The thread pool fetching the data of the asynchronous checks, created on first use."
+
+
+def get_executor(config: pytest.Config) -> ThreadPoolExecutor:
+    """Get the thread pool shared by the asynchronous checks of the session.
+
+    Args:
+        config: the pytest config of the session.
+
+    Returns:
+        the thread pool, bounded by the ``gee_async_workers`` option.
+    """
+    if EXECUTOR_KEY not in config.stash:
+        max_workers = int(config.getini("gee_async_workers"))
+        executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pytest-gee")
+        config.stash[EXECUTOR_KEY] = executor
+    return config.stash[EXECUTOR_KEY]
+
+
+class DeferrableFixture:
+    """Mixin sending the data fetch of a regression fixture to the right place.
+
+    The data is fetched immediately by default, in the shared thread pool when the check is made
+    through :py:meth:`check_async` and with the other pending checks in deferred mode.
+    """
+
+    request: pytest.FixtureRequest
+    check: Callable[..., Any]
+    _async: bool = False
+    _future: Optional[Future] = None
+    _pending: List[Tuple[Future, Callable[[Any], None]]]
+
+    def __init__(self, *args, **kwargs):
+        """Create the fixture without pending asynchronous checks.
+
+        Args:
+            *args: the positional arguments of the regression fixture.
+            **kwargs: the keyword arguments of the regression fixture.
+        """
+        super().__init__(*args, **kwargs)
+        self._pending = []
+
+    def _dispatch(
+        self,
+        object: ee.ComputedObject,
+        compare: Callable[[Any], None],
+        fetch: Optional[Callable[[], Any]] = None,
+        graph: Optional[SerializedGraph] = None,
+    ):
+        """Fetch the data of a check and compare it with the reference file.
+
+        Args:
+            object: the checked object.
+            compare: the function comparing the fetched data with the reference file.
+            fetch: the function fetching the data. By default the object is fetched with ``getInfo``
+                and the check can be deferred.
+            graph: the serialized graph of the object, its digest is the key of the response in the
+                cassette so that the object is not serialized again.
+        """
+        config = self.request.config
+        cassette = config.stash[CASSETTE_KEY]
+        batch = config.stash.get(DEFERRED_KEY, None)
+        digest = graph.digest if graph is not None else None
+
+        def get_info() -> Any:
+            return cassette.fetch(object, object.getInfo, digest=digest)
+
+        if self._async is True:
+            self._future = get_executor(config).submit(fetch or get_info)
+            self._pending.append((self._future, compare))
+        elif fetch is None and batch is not None:
+            batch.add(self.request.node.nodeid, object, compare, graph)
+        else:
+            compare(fetch() if fetch else get_info())
+
+    def check_async(self, *args, **kwargs) -> Future:
+        """Same as ``check`` but the data is fetched in a thread pool shared by the session.
+
+        The comparison with the reference file is made at the end of the test and a mismatch fails
+        it. Several checks of the same test are therefore waiting for Earth Engine together.
+
+        Args:
+            *args: the positional arguments of ``check``.
+            **kwargs: the keyword arguments of ``check``.
+
+        Returns:
+            The future of the data fetch, already done if the serialized object did not change.
+        """
+        self._async, self._future = True, None
+        try:
+            self.check(*args, **kwargs)
+        finally:
+            self._async = False
+
+        if self._future is None:
+            self._future = Future()
+            self._future.set_result(None)
+
+        return self._future
+
+    def compare_pending(self) -> List[BaseException]:
+        """Wait for the asynchronous checks and compare their data with the reference files.
+
+        Returns:
+            the error of every failed check, empty if they all passed.
+        """
+        pending, self._pending = self._pending, []
+        errors: List[BaseException] = []
+        for future, compare in pending:
+            try:
+                compare(future.result())
+            except (Exception, fail.Exception) as e:
+                errors.append(e)
+        return errors
+
+    def wait(self):
+        """Wait for the asynchronous checks and raise their failures.
+
+        The plugin compares the pending checks at the end of the test call, this only catches the
+        checks made later, in the teardown of other fixtures.
+        """
+        errors = self.compare_pending()
+        if len(errors) == 1:
+            raise errors[0]
+        elif errors:
+            fail("\n\n".join(str(e) for e in errors))
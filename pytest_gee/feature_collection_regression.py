@@ -1,18 +1,34 @@
 """Implementation of the ``feature_collection_regression`` fixture."""
 
 import os
+import shutil
+import tempfile
 from contextlib import suppress
-from typing import Optional
+from functools import partial
+from pathlib import Path
+from typing import IO, Any, Iterator, Optional, cast
 
 import ee
 import geopandas as gpd
+import yaml
 from pytest import fail
-from pytest_regressions.data_regression import DataRegressionFixture
+from pytest_regressions.common import perform_regression_check
+from pytest_regressions.data_regression import DataRegressionFixture, RegressionYamlDumper
 
-from .utils import build_fullpath, check_serialized, round_data
+from .cassette import CASSETTE_KEY
+from .comparison import FEATURE_FORMATS, check_features, check_text_lines
+from .deferred import DeferrableFixture
+from .utils import (
+    SerializedGraph,
+    build_fullpath,
+    check_serialized,
+    delete_serialized,
+    iter_pages,
+    round_data,
+)
 
 
-class FeatureCollectionFixture(DataRegressionFixture):
+class FeatureCollectionFixture(DeferrableFixture, DataRegressionFixture):
     """Fixture for regression testing of :py:class:`ee.FeatureCollection`."""
 
     def check(
@@ -22,6 +38,11 @@ class FeatureCollectionFixture(DataRegressionFixture):
         fullpath: Optional[os.PathLike] = None,
         prescision: int = 6,
         drop_index=False,
+        page_size: Optional[int] = None,
+        rtol: Optional[float] = None,
+        atol: Optional[float] = None,
+        hausdorff: Optional[float] = None,
+        format: str = "yml",
     ):
         """Check the given list against a previously recorded version, or generate a new file.
 
@@ -29,9 +50,21 @@ class FeatureCollectionFixture(DataRegressionFixture):
             data_fc: The feature collection to check.
             basename: The basename of the file to test/record. If not given the name of the test is used.
             fullpath: complete path to use as a reference file. This option will ignore ``datadir`` fixture when reading *expected* files but will still use it to write *obtained* files. Useful if a reference file is located in the session data dir for example.
-            precision: The number of decimal places to round to when comparing floats.
+            precision: The number of decimal places kept in the reference file.
             drop_index: If True, the ``system:index`` property will be removed from the feature collection before checking.
+            page_size: If set, the collection is fetched in pages of ``page_size`` features, concurrently, and written to the file one page at a time. Use it for collections larger than the 5000 elements limit of ``getInfo``. The paginated file is compared as text with the reference, so it cannot be combined with ``rtol``, ``atol`` or ``hausdorff``.
+            rtol: The relative tolerance used to compare the numeric properties, 0 by default.
+            atol: The absolute tolerance used to compare the numeric properties and the coordinates, one unit of the last kept decimal place by default.
+            hausdorff: If set, the geometries are compared with this bound on their Hausdorff distance instead of vertex by vertex.
+            format: The format of the reference file, ``"yml"`` (GeoJSON) or ``"parquet"`` (GeoParquet, requires ``pyarrow``).
         """
+        if format not in FEATURE_FORMATS:
+            raise ValueError(f"format should be one of {FEATURE_FORMATS}, got {format}.")
+        if page_size is not None and format != "yml":
+            raise ValueError("The paginated mode only writes yml reference files.")
+        if page_size is not None and (rtol, atol, hausdorff) != (None, None, None):
+            raise ValueError("The paginated mode compares the files exactly, without tolerances.")
+
         if drop_index is True:
             data_fc = data_fc.map(lambda f: f.select(f.propertyNames().remove("system:index")))
 
@@ -39,7 +72,7 @@ class FeatureCollectionFixture(DataRegressionFixture):
         data_name = build_fullpath(
             datadir=self.original_datadir,
             request=self.request,
-            extension=".yml",
+            extension=f".{format}",
             basename=basename,
             fullpath=fullpath,
             with_test_class_names=self.with_test_class_names,
@@ -48,45 +81,115 @@ class FeatureCollectionFixture(DataRegressionFixture):
 
         # check the previously registered serialized call from GEE. If it matches the current call,
         # we don't need to check the data
+        graph = SerializedGraph(data_fc)
         with suppress(AssertionError, fail.Exception):
-            check_serialized(
-                object=data_fc,
-                path=serialized_name,
-                datadir=self.datadir,
-                original_datadir=self.original_datadir,
-                request=self.request,
-                with_test_class_names=self.with_test_class_names,
-            )
+            check_serialized(object=graph, path=serialized_name, request=self.request)
             return
 
         # delete the previously created file if wasn't successful
-        serialized_name.unlink(missing_ok=True)
+        delete_serialized(serialized_name, self.request)
 
-        # round the geometry using geopandas to make sre with use the specific number of decimal places
-        gdf = gpd.GeoDataFrame.from_features(data_fc.getInfo())
-        gdf.geometry = gdf.set_precision(grid_size=10 ** (-prescision)).remove_repeated_points()
+        def to_gdf(info: dict, offset: int = 0) -> gpd.GeoDataFrame:
+            # round the geometry using geopandas to make sre with use the specific number of decimal places
+            gdf = gpd.GeoDataFrame.from_features(info)
+            gdf.index = range(offset, offset + len(gdf))
+            gdf.geometry = gdf.set_precision(grid_size=10 ** (-prescision)).remove_repeated_points()
+            return gdf
 
-        # round any float value before serving the data to the check function
-        data = gdf.to_geo_dict()
-        data = round_data(data, prescision)
-
-        # if it needs to be checked, we need to round the float values to the same precision as the
-        # reference file
-        try:
-            super().check(data, fullpath=data_name)
+        def compare(info: dict):
+            # the geometries and properties are compared with tolerances, the rounded values are only
+            # used to write the reference file
+            gdf = to_gdf(info)
+            check_features(self, gdf, data_name, prescision, rtol, atol, hausdorff, format)
 
             # IF we are here it means the data has been modified so we edit the API call accordingly
             # to make sure next run will not be forced to call the API for a response.
-            with suppress(AssertionError, fail.Exception):
-                check_serialized(
-                    object=data_fc,
-                    path=serialized_name,
+            check_serialized(
+                object=graph, path=serialized_name, request=self.request, force_regen=True
+            )
+
+        if page_size is None:
+            # the data is fetched now, in the thread pool or with the other deferred checks
+            self._dispatch(data_fc, compare, graph=graph)
+            return
+
+        # in paginated mode the pages are written one by one in a temporary file so that only a few
+        # of them are held in memory. The file is then compared with the reference.
+        cassette = self.request.config.stash[CASSETTE_KEY]
+        max_workers = int(self.request.config.getini("gee_async_workers"))
+
+        def fetch() -> Path:
+            size = data_fc.size()
+            count = cassette.fetch(size, size.getInfo)
+            pages = iter_pages(
+                data_fc,
+                count,
+                page_size,
+                fetch=lambda page: cassette.fetch(page, page.getInfo),
+                max_workers=max_workers,
+            )
+            dumped = tempfile.NamedTemporaryFile(suffix=".yml", delete=False)
+            with dumped as f:
+                geo_dicts = (to_gdf(p, i * page_size).to_geo_dict() for i, p in enumerate(pages))
+                dump_pages((cast(dict, round_data(d, prescision)) for d in geo_dicts), f)
+            return Path(dumped.name)
+
+        def compare_file(dumped: Path):
+            try:
+                perform_regression_check(
                     datadir=self.datadir,
                     original_datadir=self.original_datadir,
                     request=self.request,
+                    check_fn=check_text_lines,
+                    dump_fn=partial(copy_file, dumped),
+                    extension=".yml",
+                    fullpath=data_name,
+                    force_regen=self.force_regen,
                     with_test_class_names=self.with_test_class_names,
-                    force_regen=True,
                 )
+            finally:
+                dumped.unlink()
+
+            check_serialized(
+                object=graph, path=serialized_name, request=self.request, force_regen=True
+            )
+
+        # the data is fetched now or in the thread pool
+        self._dispatch(data_fc, compare_file, fetch)
+
+
+def dump_pages(pages: Iterator[dict], stream: IO[bytes]):
+    """Write the pages of a feature collection as a single GeoJSON YAML document.
+
+    The output is the same as dumping the whole collection with the ``data_regression`` dumper, but
+    only one page is held in memory at a time.
+
+    Args:
+        pages: the GeoJSON FeatureCollection of each page, in the order of the collection.
+        stream: the binary file to write in.
+    """
+
+    def dump(data: Any) -> bytes:
+        return yaml.dump(
+            data,
+            Dumper=RegressionYamlDumper,
+            default_flow_style=False,
+            allow_unicode=True,
+            indent=2,
+            encoding="utf-8",
+        )
+
+    empty = True
+    for page in pages:
+        if not page["features"]:
+            continue
+        stream.write(b"features:\n" if empty else b"")
+        stream.write(dump(page["features"]))
+        empty = False
+    stream.write(b"features: []\n" if empty else b"")
+    stream.write(dump({"type": "FeatureCollection"}))
+
 
-        except (AssertionError, fail.Exception) as e:
-            raise e
+def copy_file(source: Path, destination: Path):
+    """Copy the content of a file, the dump function of the paginated feature collections."""
+    shutil.copyfile(source, destination)
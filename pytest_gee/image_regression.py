@@ -2,17 +2,18 @@
 
 import os
 from contextlib import suppress
-from typing import Optional, Union
+from typing import Optional, Union, cast
 
 import ee
-import requests
 from pytest import fail
 from pytest_regressions.image_regression import ImageRegressionFixture
 
-from .utils import build_fullpath, check_serialized
+from .cassette import CASSETTE_KEY
+from .deferred import DeferrableFixture
+from .utils import SerializedGraph, build_fullpath, check_serialized, delete_serialized
 
 
-class ImageFixture(ImageRegressionFixture):
+class ImageFixture(DeferrableFixture, ImageRegressionFixture):
     """Fixture for regression testing of :py:class:`ee.Image`."""
 
     def check(
@@ -46,9 +47,13 @@ class ImageFixture(ImageRegressionFixture):
             region: The region to use for clipping the image. If not given, the image's region will be used.
             overlay: A FeatureCollection to draw on top of the image. The style will be taken from each Feature's "style" property.
         """
-        # rescale the original image
-        region = data_image if region is None else region
-        geometry = region if isinstance(region, ee.Geometry) else region.geometry()
+        # rescale the original image, the casts are needed as mypy cannot narrow the Earth Engine
+        # types with isinstance
+        if isinstance(region, ee.Geometry):
+            geometry = cast(ee.Geometry, region)
+        else:
+            element = data_image if region is None else region
+            geometry = cast(Union[ee.Image, ee.FeatureCollection, ee.Feature], element).geometry()
         data_image = data_image.clipToBoundsAndScale(geometry, scale=scale)
 
         # build the different filename to be consistent between our 3 checks
@@ -64,56 +69,57 @@ class ImageFixture(ImageRegressionFixture):
 
         # check the previously registered serialized call from GEE. If it matches the current call,
         # we don't need to check the data
+        graph = SerializedGraph(data_image)
         with suppress(AssertionError, fail.Exception):
-            check_serialized(
-                object=data_image,
-                path=serialized_name,
-                datadir=self.datadir,
-                original_datadir=self.original_datadir,
-                request=self.request,
-                with_test_class_names=self.with_test_class_names,
-            )
+            check_serialized(object=graph, path=serialized_name, request=self.request)
             return
 
         # delete the previously created file if wasn't successful
-        serialized_name.unlink(missing_ok=True)
-
-        # extract min and max for visualization
-        minMax = data_image.reduceRegion(ee.Reducer.minMax(), geometry, scale)
-
-        # create visualization parameters based on the computed minMax values
-        if viz_params is None:
-            nbBands = ee.Algorithms.If(data_image.bandNames().size().gte(3), 3, 1)
-            bands = data_image.bandNames().slice(0, ee.Number(nbBands))
-            min = bands.map(lambda b: minMax.get(ee.String(b).cat("_min")))
-            max = bands.map(lambda b: minMax.get(ee.String(b).cat("_max")))
-            viz_params = ee.Dictionary({"bands": bands, "min": min, "max": max}).getInfo()
-
-        rgb = data_image.visualize(**viz_params)
-        if overlay:
-            rgb = rgb.blend(overlay.style(styleProperty="style"))
-
-        # get the thumbnail image
-        thumb_url = rgb.getThumbURL()
-        byte_data = requests.get(thumb_url).content
-
-        # if it needs to be checked, we need to round the float values to the same precision as the
-        # reference file
-        try:
-            super().check(byte_data, diff_threshold, expect_equal, fullpath=data_name)
+        delete_serialized(serialized_name, self.request)
+
+        # responses can be served from the cassette in record/replay mode
+        cassette = self.request.config.stash[CASSETTE_KEY]
+
+        def fetch() -> bytes:
+            if viz_params is not None:
+                rgb = data_image.visualize(**viz_params)
+
+            # stretch the first 1 or 3 bands between their min and max values server-side so that
+            # the thumbnail is computed in a single request
+            else:
+                nbBands = ee.Algorithms.If(data_image.bandNames().size().gte(3), 3, 1)
+                bands = data_image.bandNames().slice(0, ee.Number(nbBands))
+                image = data_image.select(bands).toFloat()
+                minMax = image.reduceRegion(ee.Reducer.minMax(), geometry, scale)
+                min = ee.Image.constant(bands.map(lambda b: minMax.get(ee.String(b).cat("_min"))))
+                max = ee.Image.constant(bands.map(lambda b: minMax.get(ee.String(b).cat("_max"))))
+                spread = max.subtract(min)
+                spread = spread.where(spread.eq(0), 1)
+                rgb = image.subtract(min).divide(spread).visualize(min=0, max=1)
+
+            if overlay:
+                rgb = rgb.blend(overlay.style(styleProperty="style"))
+
+            # the rendered image is rescaled on the grid of the thumbnails, the bounds of the region at
+            # the given scale, so that the overlay without a footprint is drawn on it as well. The
+            # grid is part of the computation and the thumbnail is still made in a single request.
+            rgb = rgb.clipToBoundsAndScale(geometry, scale=scale)
+
+            def get_png() -> bytes:
+                return ee.data.computePixels({"expression": rgb, "fileFormat": "PNG"})
+
+            return cassette.fetch(rgb, get_png, kind="thumbnail")
+
+        def compare(byte_data: bytes):
+            ImageRegressionFixture.check(
+                self, byte_data, diff_threshold, expect_equal, fullpath=data_name
+            )
 
             # IF we are here it means the data has been modified so we edit the API call accordingly
             # to make sure next run will not be forced to call the API for a response.
-            with suppress(AssertionError, fail.Exception):
-                check_serialized(
-                    object=data_image,
-                    path=serialized_name,
-                    datadir=self.datadir,
-                    original_datadir=self.original_datadir,
-                    request=self.request,
-                    with_test_class_names=self.with_test_class_names,
-                    force_regen=True,
-                )
-
-        except (AssertionError, fail.Exception) as e:
-            raise e
+            check_serialized(
+                object=graph, path=serialized_name, request=self.request, force_regen=True
+            )
+
+        # the data is fetched now or in the thread pool
+        self._dispatch(data_image, compare, fetch)
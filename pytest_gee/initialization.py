@@ -0,0 +1,68 @@
+"""Initialization of Earth Engine in the background of the test session.
+
+The OAuth handshake and :py:func:`ee.Initialize` take a noticeable part of the startup of small test
+runs. When the ``gee_init`` option is set, the plugin starts the initialization in a thread as soon
+as a test using Earth Engine is collected so that it overlaps with the rest of the collection. The
+fixtures using Earth Engine wait for it through the ``gee_init`` fixture.
+"""
+
+from __future__ import annotations
+
+import threading
+from typing import Callable, Optional
+
+from pytest import StashKey
+
+METHODS = ("service_account", "token")
+"The available initialization methods, named after the ``init_ee_from_*`` functions."
+
+
+class BackgroundInit:
+    """An Earth Engine initialization running in a daemon thread."""
+
+    def __init__(self, method: str):
+        """Create the initialization, it is started by :py:meth:`start`.
+
+        Args:
+            method: the initialization method, one of ``METHODS``.
+        """
+        if method not in METHODS:
+            raise ValueError(f"gee_init should be one of {METHODS}, got {method}.")
+        self.method = method
+        self.error: Optional[BaseException] = None
+        self.thread = threading.Thread(target=self._run, name="pytest-gee-init", daemon=True)
+
+    def _run(self):
+        """Call the init function and keep its error for the waiting fixtures."""
+        import pytest_gee
+
+        init: Callable[[], None] = getattr(pytest_gee, f"init_ee_from_{self.method}")
+        try:
+            init()
+        except BaseException as e:
+            self.error = e
+
+    @property
+    def started(self) -> bool:
+        """Whether the initialization thread was started."""
+        return self.thread.ident is not None
+
+    def start(self):
+        """Start the initialization thread."""
+        self.thread.start()
+
+    def wait(self):
+        """Wait for the end of the initialization, starting it if needed.
+
+        Raises:
+            BaseException: the error raised by the init function, if any.
+        """
+        if not self.started:
+            self.start()
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
+
+
+INIT_KEY = StashKey[BackgroundInit]()
+"The background initialization of the session, only set when the ``gee_init`` option is used."
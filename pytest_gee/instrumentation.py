@@ -0,0 +1,205 @@
+"""Instrumentation of the Earth Engine calls made through pytest-gee.
+
+Every request sent by the transport is recorded with its latency and the bytes sent and received,
+under the name of the Earth Engine operation guessed from its url. The serializations made by the
+helpers are recorded apart, their size is not transferred, and so are the lookups of the serialized
+graphs. The records are attributed to the test running when they are made, including the calls
+made in the threads working for it, unless the context making them is attributed to other tests
+with :py:meth:`Recorder.attribute`. They are attached to the teardown report of the test so that
+they also reach the ``pytest-xdist`` controller.
+"""
+
+from __future__ import annotations
+
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, Dict, Iterator, Optional, Tuple
+from urllib.parse import urlsplit
+
+if TYPE_CHECKING:
+    import ee
+
+OPERATIONS: Tuple[Tuple[str, Optional[str], str], ...] = (
+    ("token", None, r"/token$"),
+    ("getInfo", None, r"/value:compute$"),
+    ("getPixels", None, r":computePixels$|:getPixels$|/thumbnails$|:computeFeatures$"),
+    ("listAssets", None, r":listAssets$"),
+    ("copyAsset", None, r":copy$"),
+    ("startExport", None, r":export$"),
+    ("getTaskStatus", "GET", r"/operations/[^/]+$"),
+    ("createAsset", "POST", r"/assets$"),
+    ("deleteAsset", "DELETE", r"/assets/"),
+    ("getAsset", "GET", r"/assets/"),
+)
+"The operation name, HTTP method and url path pattern of the recognized Earth Engine requests."
+
+
+def classify(method: str, uri: str) -> str:
+    """Guess the Earth Engine operation of a request.
+
+    Args:
+        method: the HTTP method of the request.
+        uri: the requested url.
+
+    Returns:
+        the name of the operation, ``other`` if it's not recognized.
+    """
+    path = urlsplit(uri).path
+    for name, operation_method, pattern in OPERATIONS:
+        if operation_method in (None, method.upper()) and re.search(pattern, path):
+            return name
+    return "other"
+
+
+_attribution: ContextVar[Tuple[str, ...]] = ContextVar("pytest_gee_attribution", default=())
+"The tests the calls made in the current context are attributed to, the running one if empty."
+
+
+def empty_stats() -> dict:
+    """Create the statistics of a test without any call."""
+    return {
+        "calls": {},
+        "serialize": {"count": 0, "seconds": 0.0, "bytes": 0},
+        "cache": {"hit": 0, "miss": 0},
+    }
+
+
+class Recorder:
+    """The Earth Engine calls of the running test and the statistics of the finished ones."""
+
+    def __init__(self):
+        """Create an empty recorder."""
+        self.current = ""
+        self.running: Dict[str, dict] = {}
+        self.tests: Dict[str, dict] = {}
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def attribute(self, *nodeids: str) -> Iterator[None]:
+        """Attribute the calls made in the current context to some tests instead of the running one.
+
+        The calls made for several tests at once, like the batch request of the deferred checks, are
+        shared evenly between them.
+
+        Args:
+            *nodeids: the ids of the tests, repeated to give a test several shares.
+        """
+        token = _attribution.set(nodeids)
+        try:
+            yield
+        finally:
+            _attribution.reset(token)
+
+    def _add(self, section: str, key: Optional[str], values: Dict[str, float]):
+        """Add values to the statistics of the tests the current context is attributed to."""
+        nodeids = _attribution.get() or (self.current,)
+        share = 1 / len(nodeids) if len(nodeids) > 1 else 1
+        with self.lock:
+            for nodeid in nodeids:
+                stats = self.running.setdefault(nodeid, empty_stats())
+                entry = stats[section]
+                if key is not None:
+                    entry = entry.setdefault(key, {"count": 0, "seconds": 0.0, "bytes": 0})
+                for name, value in values.items():
+                    entry[name] += value * share
+
+    def record(self, operation: str, seconds: float, size: int = 0):
+        """Record a call in the statistics of the running test.
+
+        Args:
+            operation: the name of the operation.
+            seconds: the wall-clock duration of the call.
+            size: the number of bytes sent and received.
+        """
+        self._add("calls", operation, {"count": 1, "seconds": seconds, "bytes": size})
+
+    def serialization(self, seconds: float, size: int):
+        """Record a serialization in the statistics of the running test.
+
+        Args:
+            seconds: the duration of the serialization.
+            size: the number of bytes of the serialized graph.
+        """
+        self._add("serialize", None, {"count": 1, "seconds": seconds, "bytes": size})
+
+    def cache(self, hit: bool):
+        """Record a lookup of a serialized graph in the statistics of the running test.
+
+        Args:
+            hit: whether the graph matched the registered one, sparing the data fetch.
+        """
+        self._add("cache", None, {"hit" if hit else "miss": 1})
+
+    def clear(self):
+        """Forget all the recorded calls, at the start of a session."""
+        with self.lock:
+            self.running.clear()
+            self.tests.clear()
+
+    def pop(self, nodeid: str) -> Optional[dict]:
+        """Remove the statistics of a test from the running ones.
+
+        Args:
+            nodeid: the id of the test, the calls made outside of any test are stored under ``""``.
+
+        Returns:
+            the statistics of the test or None if it made no call.
+        """
+        with self.lock:
+            return self.running.pop(nodeid, None)
+
+
+_recorder = Recorder()
+
+
+def get_recorder() -> Recorder:
+    """Get the recorder of the Earth Engine calls of the session."""
+    return _recorder
+
+
+def serialize(object: ee.ComputedObject) -> str:
+    """Serialize an Earth Engine object, recording the duration and the size of the graph.
+
+    Args:
+        object: the object to serialize.
+
+    Returns:
+        the serialized graph of the object.
+    """
+    start = time.perf_counter()
+    serialized = object.serialize()
+    _recorder.serialization(time.perf_counter() - start, len(serialized))
+    return serialized
+
+
+def summarize(tests: Dict[str, dict]) -> dict:
+    """Sum the statistics of several tests.
+
+    Args:
+        tests: the statistics of each test.
+
+    Returns:
+        the statistics of all the tests together.
+    """
+    total = empty_stats()
+    for stats in tests.values():
+        for operation, call in stats["calls"].items():
+            summed = total["calls"].setdefault(operation, {"count": 0, "seconds": 0.0, "bytes": 0})
+            for key in summed:
+                summed[key] += call[key]
+        for section in ("serialize", "cache"):
+            for key in total[section]:
+                total[section][key] += stats[section][key]
+    return total
+
+
+def format_bytes(size: float) -> str:
+    """Format a number of bytes for the terminal summary."""
+    for unit in ("B", "kB", "MB"):
+        if size < 1000:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1000
+    return f"{size:.1f} GB"
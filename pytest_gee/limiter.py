@@ -0,0 +1,213 @@
+"""The session-wide limits of the Earth Engine traffic of pytest-gee.
+
+Earth Engine enforces per-project quotas on the number of concurrent interactive requests and of
+running batch tasks. Once the checks, listings, deletions and exports of a session run in threads
+they can easily exceed them and fail with "Too many concurrent aggregations". The
+:py:class:`Limiter` shared by the session bounds both separately:
+
+- the interactive requests sent by the transport are limited in number and in rate,
+- the export tasks started by the helpers are limited in number and in start rate, a slot is only
+  released when the task is seen finished.
+
+When the server still reports a quota exhaustion (HTTP 429), every new request waits for a backoff
+period that doubles with each consecutive exhaustion and is reset by the next successful response.
+"""
+
+from __future__ import annotations
+
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Dict, Iterator, Optional, Set, cast
+
+if TYPE_CHECKING:
+    import ee
+
+settings: Dict[str, float] = {
+    "max_requests": 20,
+    "request_rate": 0.0,
+    "max_tasks": 10,
+    "task_rate": 0.0,
+    "backoff": 1.0,
+    "max_backoff": 60.0,
+}
+"The settings of the shared limiter, changed with :py:func:`configure`. 0 means no limit."
+
+
+class TokenBucket:
+    """A thread-safe token bucket refilled at a constant rate."""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        """Create a full bucket.
+
+        Args:
+            rate: the number of tokens added per second, 0 to never wait.
+            burst: the capacity of the bucket, ``max(rate, 1)`` by default.
+        """
+        self.rate = rate
+        self.capacity = burst or max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Take a token, waiting for the bucket to be refilled if it is empty."""
+        if self.rate <= 0:
+            return
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # the token is reserved now so that the waiting threads are served in order
+            self.tokens -= 1
+            delay = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if delay > 0:
+            time.sleep(delay)
+
+
+class Limiter:
+    """The concurrency and rate limits of the interactive requests and of the batch tasks."""
+
+    def __init__(
+        self,
+        max_requests: int = 20,
+        request_rate: float = 0.0,
+        max_tasks: int = 10,
+        task_rate: float = 0.0,
+        backoff: float = 1.0,
+        max_backoff: float = 60.0,
+    ):
+        """Create the limiter.
+
+        Args:
+            max_requests: the maximum number of interactive requests in flight, 0 for no limit.
+            request_rate: the maximum number of interactive requests sent per second, 0 for no limit.
+            max_tasks: the maximum number of batch tasks running at the same time, 0 for no limit.
+            task_rate: the maximum number of batch tasks started per second, 0 for no limit.
+            backoff: the first pause after a quota exhaustion, in seconds.
+            max_backoff: the maximum pause after consecutive quota exhaustions, in seconds.
+        """
+        self.max_requests = max_requests
+        self.max_tasks = max_tasks
+        self.requests = threading.BoundedSemaphore(max_requests) if max_requests > 0 else None
+        self.tasks = threading.BoundedSemaphore(max_tasks) if max_tasks > 0 else None
+        self.request_bucket = TokenBucket(request_rate)
+        self.task_bucket = TokenBucket(task_rate)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.running: Set[str] = set()
+        self.streak = 0
+        self.resume_at = 0.0
+        self.lock = threading.Lock()
+
+    def _wait_backoff(self):
+        """Wait for the end of the pause following a quota exhaustion."""
+        while True:
+            delay = self.resume_at - time.monotonic()
+            if delay <= 0:
+                return
+            time.sleep(delay)
+
+    @contextmanager
+    def request(self) -> Iterator[None]:
+        """Hold a slot of the interactive requests while sending one."""
+        self._wait_backoff()
+        self.request_bucket.acquire()
+        if self.requests is None:
+            yield
+            return
+        with self.requests:
+            yield
+
+    def exhausted(self):
+        """Pause the new requests after the server reported a quota exhaustion."""
+        with self.lock:
+            delay = min(self.max_backoff, self.backoff * 2**self.streak)
+            delay += random.uniform(0, delay / 2)
+            self.resume_at = max(self.resume_at, time.monotonic() + delay)
+            self.streak += 1
+
+    def recovered(self):
+        """Reset the backoff after a request was accepted by the server."""
+        if self.streak:
+            with self.lock:
+                self.streak = 0
+
+    def start_task(self, task: ee.batch.Task) -> ee.batch.Task:
+        """Start a batch task once a task slot is available.
+
+        The slot is held until :py:meth:`finish_task` is called with the id of the task.
+
+        Args:
+            task: the task to start.
+
+        Returns:
+            the started task.
+        """
+        self.task_bucket.acquire()
+        if self.tasks is not None:
+            self.tasks.acquire()
+        try:
+            task.start()
+        except BaseException:
+            if self.tasks is not None:
+                self.tasks.release()
+            raise
+        with self.lock:
+            self.running.add(cast(str, task.id))
+        return task
+
+    def finish_task(self, task_id: str):
+        """Release the slot of a task started with :py:meth:`start_task`, once.
+
+        Args:
+            task_id: the id of the task, the unknown ids are ignored.
+        """
+        with self.lock:
+            if task_id not in self.running:
+                return
+            self.running.discard(task_id)
+        if self.tasks is not None:
+            self.tasks.release()
+
+
+_limiter: Optional[Limiter] = None
+_lock = threading.Lock()
+
+
+def configure(**kwargs):
+    """Change the settings of the shared limiter.
+
+    The requests and tasks holding a slot of the previous limiter are not counted by the new one.
+
+    Args:
+        **kwargs: the new values of the keys of ``settings``.
+    """
+    global _limiter
+    unknown = set(kwargs) - set(settings)
+    if unknown:
+        raise ValueError(f"Unknown limiter settings: {sorted(unknown)}.")
+    with _lock:
+        settings.update(kwargs)
+        _limiter = None
+
+
+def get_limiter() -> Limiter:
+    """Get the limiter shared by all the Earth Engine traffic of pytest-gee.
+
+    Returns:
+        the limiter, created with the current ``settings`` on first use.
+    """
+    global _limiter
+    with _lock:
+        if _limiter is None:
+            _limiter = Limiter(
+                max_requests=int(settings["max_requests"]),
+                request_rate=settings["request_rate"],
+                max_tasks=int(settings["max_tasks"]),
+                task_rate=settings["task_rate"],
+                backoff=settings["backoff"],
+                max_backoff=settings["max_backoff"],
+            )
+        return _limiter
@@ -8,10 +8,12 @@ import ee
 from pytest import fail
 from pytest_regressions.data_regression import DataRegressionFixture
 
-from .utils import build_fullpath, check_serialized, round_data
+from .comparison import check_data
+from .deferred import DeferrableFixture
+from .utils import SerializedGraph, build_fullpath, check_serialized, delete_serialized
 
 
-class ListFixture(DataRegressionFixture):
+class ListFixture(DeferrableFixture, DataRegressionFixture):
     """Fixture for regression testing of :py:class:`ee.List`."""
 
     def check(
@@ -20,6 +22,8 @@ class ListFixture(DataRegressionFixture):
         basename: Optional[str] = None,
         fullpath: Optional[os.PathLike] = None,
         prescision: int = 6,
+        rtol: Optional[float] = None,
+        atol: Optional[float] = None,
     ):
         """Check the given list against a previously recorded version, or generate a new file.
 
@@ -27,7 +31,9 @@ class ListFixture(DataRegressionFixture):
             data_list: The list to check.
             basename: The basename of the file to test/record. If not given the name of the test is used.
             fullpath: complete path to use as a reference file. This option will ignore ``datadir`` fixture when reading *expected* files but will still use it to write *obtained* files. Useful if a reference file is located in the session data dir for example.
-            precision: The number of decimal places to round to when comparing floats.
+            precision: The number of decimal places kept in the reference file.
+            rtol: The relative tolerance used to compare the numbers, 0 by default.
+            atol: The absolute tolerance used to compare the numbers, one unit of the last kept decimal place by default.
         """
         # build the different filename to be consistent between our 3 checks
         data_name = build_fullpath(
@@ -42,38 +48,24 @@ class ListFixture(DataRegressionFixture):
 
         # check the previously registered serialized call from GEE. If it matches the current call,
         # we don't need to check the data
+        graph = SerializedGraph(data_list)
         with suppress(AssertionError, fail.Exception):
-            check_serialized(
-                object=data_list,
-                path=serialized_name,
-                datadir=self.datadir,
-                original_datadir=self.original_datadir,
-                request=self.request,
-                with_test_class_names=self.with_test_class_names,
-            )
+            check_serialized(object=graph, path=serialized_name, request=self.request)
             return
 
         # delete the previously created file if wasn't successful
-        serialized_name.unlink(missing_ok=True)
+        delete_serialized(serialized_name, self.request)
 
-        # if it needs to be checked, we need to round the float values to the same precision as the
-        # reference file
-        data = round_data(data_list.getInfo(), prescision)
-        try:
-            super().check(data, fullpath=data_name)
+        def compare(info: list):
+            # the numbers are compared with tolerances, the rounded values are only used to write the
+            # reference file
+            check_data(self, info, data_name, prescision, rtol, atol)
 
             # IF we are here it means the data has been modified so we edit the API call accordingly
             # to make sure next run will not be forced to call the API for a response.
-            with suppress(AssertionError, fail.Exception):
-                check_serialized(
-                    object=data_list,
-                    path=serialized_name,
-                    datadir=self.datadir,
-                    original_datadir=self.original_datadir,
-                    request=self.request,
-                    with_test_class_names=self.with_test_class_names,
-                    force_regen=True,
-                )
+            check_serialized(
+                object=graph, path=serialized_name, request=self.request, force_regen=True
+            )
 
-        except (AssertionError, fail.Exception) as e:
-            raise e
+        # the data is fetched now, in the thread pool or with the other deferred checks
+        self._dispatch(data_list, compare, graph=graph)
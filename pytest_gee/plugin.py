@@ -1,30 +1,453 @@
-"""A pytest plugin to build a GEE environment for a test session."""
+"""A pytest plugin to build a GEE environment for a test session.
+
+The plugin is loaded in every pytest session of the environment, even the ones that never use a GEE
+fixture. earthengine, the helpers and the fixture modules with their heavy dependencies are
+therefore only imported when they are first needed.
+"""
 
 from __future__ import annotations
 
+import json
+import math
 import os
+import shutil
+import tempfile
 import uuid
-from pathlib import Path
+from pathlib import Path, PurePosixPath
+from typing import TYPE_CHECKING, Any, Iterator, List, Optional
 
-import ee
 import pytest
+from _pytest.runner import runtestprotocol
+
+from . import instrumentation, limiter, transport
+from .cassette import CASSETTE_KEY, Cassette
+from .deferred import DEFERRED_KEY, EXECUTOR_KEY, DeferrableFixture, DeferredBatch
+from .initialization import INIT_KEY, BackgroundInit
+
+if TYPE_CHECKING:
+    from .array_regression import ArrayFixture
+    from .dictionary_regression import DictionaryFixture
+    from .feature_collection_regression import FeatureCollectionFixture
+    from .image_regression import ImageFixture
+    from .list_regression import ListFixture
+
+XDIST_KEY = pytest.StashKey[dict]()
+"The hash and coordination directory shared by the controller with the xdist workers."
+
+SUMMARY_SIZE = 10
+"The number of tests listed in the Earth Engine section of the terminal summary."
+
+LIMITS = ("gee_max_requests", "gee_request_rate", "gee_max_tasks", "gee_task_rate")
+"The options of the session limiter, set in the ini file or overridden from the command line."
+
+
+def pytest_addoption(parser: pytest.Parser):
+    """Register the ``pytest-gee`` configuration options."""
+    group = parser.getgroup("gee")
+    group.addoption(
+        "--gee-record",
+        action="store_const",
+        const="record",
+        dest="gee_cassette",
+        help="save every Earth Engine response of the regression fixtures in the cassette folder",
+    )
+    group.addoption(
+        "--gee-replay",
+        action="store_const",
+        const="replay",
+        dest="gee_cassette",
+        help="serve the Earth Engine responses of the regression fixtures from the cassette folder",
+    )
+    group.addoption(
+        "--gee-deferred",
+        action="store_true",
+        help="fetch the data of the list, dictionary and feature collection checks of several tests in a single request",
+    )
+    group.addoption(
+        "--gee-max-requests",
+        dest="gee_max_requests",
+        help="maximum number of Earth Engine requests in flight, overrides the gee_max_requests ini option",
+    )
+    group.addoption(
+        "--gee-request-rate",
+        dest="gee_request_rate",
+        help="maximum number of Earth Engine requests per second, overrides the gee_request_rate ini option",
+    )
+    group.addoption(
+        "--gee-max-tasks",
+        dest="gee_max_tasks",
+        help="maximum number of export tasks running at the same time, overrides the gee_max_tasks ini option",
+    )
+    group.addoption(
+        "--gee-task-rate",
+        dest="gee_task_rate",
+        help="maximum number of export tasks started per second, overrides the gee_task_rate ini option",
+    )
+    group.addoption(
+        "--gee-report",
+        dest="gee_report",
+        help="write the Earth Engine calls of each test to this JSON file, overrides the gee_report ini option",
+    )
+    parser.addini(
+        "gee_init",
+        help="initialize Earth Engine in the background with init_ee_from_<gee_init>: 'service_account' or 'token'",
+        default="",
+    )
+    parser.addini(
+        "gee_http_pool_size",
+        help="maximum number of connections kept open to the Earth Engine servers",
+        default="10",
+    )
+    parser.addini(
+        "gee_http_timeout",
+        help="maximum time to wait for an Earth Engine response, in seconds",
+        default="300",
+    )
+    parser.addini(
+        "gee_http_retries",
+        help="number of retries of the Earth Engine requests failing to connect",
+        default="5",
+    )
+    parser.addini(
+        "gee_report",
+        help="JSON file where the Earth Engine calls of each test are written, relative to the rootdir",
+        default="",
+    )
+    parser.addini(
+        "gee_deferred_batch_size",
+        help="number of deferred checks fetched in a single request",
+        default="100",
+    )
+    parser.addini(
+        "gee_async_workers",
+        help="number of threads fetching the data of the check_async calls",
+        default="8",
+    )
+    parser.addini(
+        "gee_cassette_dir",
+        help="folder where the Earth Engine responses are recorded, relative to the rootdir",
+        default=".gee_cassettes",
+    )
+    parser.addini(
+        "gee_serialized_store",
+        help="where the serialized graphs are registered: 'files' (one yml per check) or 'sqlite' (one database per directory)",
+        default="files",
+    )
+    parser.addini(
+        "gee_max_requests",
+        help="maximum number of Earth Engine requests in flight, shared by the xdist workers (0 for no limit)",
+        default="20",
+    )
+    parser.addini(
+        "gee_request_rate",
+        help="maximum number of Earth Engine requests per second, shared by the xdist workers (0 for no limit)",
+        default="0",
+    )
+    parser.addini(
+        "gee_max_tasks",
+        help="maximum number of export tasks running at the same time",
+        default="10",
+    )
+    parser.addini(
+        "gee_task_rate",
+        help="maximum number of export tasks started per second (0 for no limit)",
+        default="0",
+    )
+    parser.addini(
+        "gee_cache_max_age",
+        help="number of days after which the assets of gee_folder_cache are evicted",
+        default="",
+    )
+    parser.addini(
+        "gee_cache_max_count",
+        help="maximum number of assets kept in gee_folder_cache, the oldest are evicted first",
+        default="",
+    )
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_configure(config: pytest.Config):
+    """Start the Earth Engine initialization and set up the tools used by the regression fixtures.
+
+    The hook runs before the ``pytest_configure`` of the ``conftest.py`` files so that the transport
+    is configured before they initialize Earth Engine.
+    """
+    transport.configure(
+        pool_size=int(config.getini("gee_http_pool_size")),
+        timeout=float(config.getini("gee_http_timeout")),
+        retries=int(config.getini("gee_http_retries")),
+    )
+
+    # the request quota is shared by the project, each xdist worker gets its part of it. The tasks
+    # are started by the single worker building the test folder.
+    limits = {name: float(_get_option(config, name)) for name in LIMITS}
+    if limits["gee_max_tasks"] < 1:
+        raise pytest.UsageError(
+            f"gee_max_tasks should be at least 1, got {limits['gee_max_tasks']}."
+        )
+    workers = int(getattr(config, "workerinput", {}).get("workercount", 1))
+    limiter.configure(
+        max_requests=math.ceil(limits["gee_max_requests"] / workers),
+        request_rate=limits["gee_request_rate"] / workers,
+        max_tasks=int(limits["gee_max_tasks"]),
+        task_rate=limits["gee_task_rate"],
+    )
+    instrumentation.get_recorder().clear()
+
+    # the cassette also keeps the responses of the initialization, it must be set before it starts
+    path = config.rootpath / config.getini("gee_cassette_dir")
+    config.stash[CASSETTE_KEY] = Cassette(path, config.getoption("gee_cassette"))
+    transport.use_cassette(config.stash[CASSETTE_KEY])
+
+    # the initialization is started by the first collected test using Earth Engine
+    method = config.getini("gee_init")
+    if method:
+        config.stash[INIT_KEY] = BackgroundInit(method)
+
+    if config.getoption("gee_deferred"):
+        config.stash[DEFERRED_KEY] = DeferredBatch(int(config.getini("gee_deferred_batch_size")))
+
+
+def _get_option(config: pytest.Config, name: str) -> str:
+    """Read an option from the command line, or from the ini file if it's not set there."""
+    value = config.getoption(name)
+    return config.getini(name) if value is None else value
+
+
+def pytest_unconfigure(config: pytest.Config):
+    """Stop the thread pool of the asynchronous checks and release the cassette."""
+    transport.use_cassette(None)
+    executor = config.stash.get(EXECUTOR_KEY, None)
+    if executor is not None:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_runtest_protocol(item: pytest.Item, nextitem: Optional[pytest.Item]):
+    """Hold the reports of the tests with deferred checks until their checks are resolved."""
+    batch = item.config.stash.get(DEFERRED_KEY, None)
+    if batch is None:
+        return None
+
+    item.ihook.pytest_runtest_logstart(nodeid=item.nodeid, location=item.location)
+    reports = runtestprotocol(item, nextitem=nextitem, log=False)
+    if item.nodeid in batch.nodeids:
+        batch.held.append((item, reports))
+    else:
+        _log_reports(item, reports)
+
+    # the batch is resolved in the teardown of the last test using it, or now if the session stops
+    # before reaching it
+    stopping = item.session.shouldstop or item.session.shouldfail
+    if stopping or not batch.checks:
+        _release_batch(item.config)
+
+    return True
+
+
+def _release_batch(config: pytest.Config):
+    """Resolve the pending deferred checks and log the held reports.
+
+    The calls made for the held tests are only known once their checks are resolved, they are
+    attached to their teardown report here.
+    """
+    batch = config.stash[DEFERRED_KEY]
+    if batch.checks:
+        batch.resolve(config)
+    for held_item, held_reports in batch.release():
+        _attach_calls(held_reports[-1], held_item.nodeid)
+        _log_reports(held_item, held_reports)
 
-from . import utils
-from .dictionary_regression import DictionaryFixture
-from .feature_collection_regression import FeatureCollectionFixture
-from .image_regression import ImageFixture
-from .list_regression import ListFixture
+
+def pytest_itemcollected(item: pytest.Item):
+    """Start the background initialization when the first test using Earth Engine is collected.
+
+    The initialization then overlaps with the rest of the collection. It is not started for the
+    sessions without such a test or that only list the tests.
+    """
+    background = item.config.stash.get(INIT_KEY, None)
+    if background is None or background.started or item.config.option.collectonly:
+        return
+    if "gee_init" in getattr(item, "fixturenames", ()):
+        background.start()
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_runtest_teardown(item: pytest.Item, nextitem: Optional[pytest.Item]):
+    """Resolve the deferred checks before the fixtures they may depend on are torn down."""
+    batch = item.config.stash.get(DEFERRED_KEY, None)
+    if batch is None or not batch.checks:
+        return
+
+    # xdist workers can only report the test they are running so the checks are resolved after
+    # each test, batching only the checks of the same test
+    xdist_worker = hasattr(item.config, "workerinput")
+    last_of_module = nextitem is None or getattr(nextitem, "module", None) is not getattr(
+        item, "module", None
+    )
+    if xdist_worker or last_of_module or batch.is_full():
+        batch.resolve(item.config)
+
+
+def _log_reports(item: pytest.Item, reports: List[pytest.TestReport]):
+    """Log the reports of a test and its end, its start is logged before running it."""
+    for report in reports:
+        item.ihook.pytest_runtest_logreport(report=report)
+    item.ihook.pytest_runtest_logfinish(nodeid=item.nodeid, location=item.location)
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_runtest_setup(item: pytest.Item):
+    """Attribute the Earth Engine calls made from now on to the starting test."""
+    instrumentation.get_recorder().current = item.nodeid
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_makereport(item: pytest.Item, call: pytest.CallInfo):
+    """Fail the call of a test on its asynchronous checks and attach its Earth Engine calls."""
+    outcome = yield
+    if call.when == "call":
+        _compare_pending(item, outcome.get_result())
+    if call.when != "teardown":
+        return
+
+    # the calls of the tests with deferred checks are attached when their reports are released
+    instrumentation.get_recorder().current = ""
+    batch = item.config.stash.get(DEFERRED_KEY, None)
+    if batch is None or item.nodeid not in batch.nodeids:
+        _attach_calls(outcome.get_result(), item.nodeid)
+
+
+def _compare_pending(item: pytest.Item, report: pytest.TestReport):
+    """Compare the asynchronous checks of the fixtures of a test and fail its call on a mismatch.
+
+    Like the deferred checks, the failures are reported on the test and not as errors of the
+    teardown of the fixtures.
+    """
+    errors: List[BaseException] = []
+    for value in getattr(item, "funcargs", {}).values():
+        if isinstance(value, DeferrableFixture):
+            errors += value.compare_pending()
+    if errors and report.passed:
+        report.outcome = "failed"
+        report.longrepr = "\n\n".join(str(e) for e in errors)
+
+
+def _attach_calls(report: Any, nodeid: str):
+    """Move the Earth Engine calls of a test from the recorder to its teardown report."""
+    stats = instrumentation.get_recorder().pop(nodeid)
+    if stats is not None:
+        report.gee_calls = stats
+
+
+def pytest_runtest_logreport(report: pytest.TestReport):
+    """Collect the Earth Engine calls of the finished tests, the xdist reports included."""
+    stats = getattr(report, "gee_calls", None)
+    if stats is not None:
+        instrumentation.get_recorder().tests[report.nodeid] = stats
+
+
+def pytest_terminal_summary(terminalreporter, config: pytest.Config):
+    """Summarize the Earth Engine calls of the session and list the tests waiting the most for them."""
+    tests = instrumentation.get_recorder().tests
+    if not tests or hasattr(config, "workerinput"):
+        return
+
+    def seconds(stats: dict) -> float:
+        return sum(call["seconds"] for call in stats["calls"].values())
+
+    write = terminalreporter.write_line
+    terminalreporter.write_sep("=", "Earth Engine calls")
+    total = instrumentation.summarize(tests)
+    calls = sorted(total["calls"].items(), key=lambda item: -item[1]["seconds"])
+    for operation, call in calls:
+        size = instrumentation.format_bytes(call["bytes"])
+        write(f"{operation:<15} {call['count']:>7.4g} calls {call['seconds']:>9.2f}s {size:>10}")
+    serialize, cache = total["serialize"], total["cache"]
+    size = instrumentation.format_bytes(serialize["bytes"])
+    write(
+        f"{'serialize':<15} {serialize['count']:>7.4g} times {serialize['seconds']:>9.2f}s {size:>10}"
+    )
+    write(f"serialized graphs: {cache['hit']:.4g} hits, {cache['miss']:.4g} misses")
+
+    write(f"slowest {min(SUMMARY_SIZE, len(tests))} tests:")
+    slowest = sorted(tests.items(), key=lambda item: -seconds(item[1]))[:SUMMARY_SIZE]
+    for nodeid, stats in slowest:
+        count = sum(call["count"] for call in stats["calls"].values())
+        size = instrumentation.format_bytes(sum(c["bytes"] for c in stats["calls"].values()))
+        write(f"{seconds(stats):>9.2f}s {count:>7.4g} calls {size:>10}  {nodeid}")
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_configure_node(node):
+    """Share the session hash and a coordination directory with every xdist worker."""
+    config = node.config
+    if XDIST_KEY not in config.stash:
+        shared_dir = tempfile.mkdtemp(prefix="pytest-gee-")
+        config.stash[XDIST_KEY] = {"gee_hash": uuid.uuid4().hex, "gee_shared_dir": shared_dir}
+    node.workerinput.update(config.stash[XDIST_KEY])
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_sessionfinish(session: pytest.Session):
+    """Report the deferred checks left, write the report of the Earth Engine calls and delete the test folder shared by the xdist workers."""
+    # a session interrupted before the end of a module still has checks and reports to release,
+    # before the fixtures they may depend on are torn down
+    if DEFERRED_KEY in session.config.stash:
+        _release_batch(session.config)
+
+    report = _get_option(session.config, "gee_report")
+    if report and not hasattr(session.config, "workerinput"):
+        tests = instrumentation.get_recorder().tests
+        content = {"tests": tests, "total": instrumentation.summarize(tests)}
+        (session.config.rootpath / report).write_text(json.dumps(content, indent=2))
+
+    if XDIST_KEY not in session.config.stash:
+        return
+
+    shared_dir = Path(session.config.stash[XDIST_KEY]["gee_shared_dir"])
+    state_file = shared_dir / "gee_test_folder.json"
+    if state_file.exists():
+        # only the sessions that registered a folder need Earth Engine to delete it
+        from . import utils
+
+        if INIT_KEY in session.config.stash:
+            session.config.stash[INIT_KEY].wait()
+
+        state = json.loads(state_file.read_text())
+        # a failed build may have stopped before creating the folder
+        if state["ready"] is True or utils.asset_exists(state["folder"]):
+            utils.delete_assets(state["folder"], False)
+    shutil.rmtree(shared_dir, ignore_errors=True)
 
 
 @pytest.fixture(scope="session")
-def gee_hash():
-    """Generate a unique hash for the test session."""
-    return uuid.uuid4().hex
+def gee_init(pytestconfig):
+    """Wait for the background initialization of Earth Engine.
+
+    It does nothing if the ``gee_init`` option is not set. All the fixtures of ``pytest-gee`` using
+    Earth Engine depend on it, request it in the tests calling Earth Engine directly.
+    """
+    background = pytestconfig.stash.get(INIT_KEY, None)
+    if background is not None:
+        background.wait()
+
+
+@pytest.fixture(scope="session")
+def gee_hash(pytestconfig):
+    """Generate a unique hash for the test session.
+
+    When the tests are distributed with ``pytest-xdist``, all the workers share the same hash.
+    """
+    workerinput = getattr(pytestconfig, "workerinput", {})
+    return workerinput.get("gee_hash", uuid.uuid4().hex)
 
 
 @pytest.fixture(scope="session")
-def gee_folder_root():
+def gee_folder_root(gee_init):
     """Link to the root folder of the connected account."""
+    import ee
+
     # The credential information cannot be reached from
     # the ee API as reported in https://issuetracker.google.com/issues/325020447
     project_id = os.environ.get("EARTHENGINE_PROJECT", ee.data._cloud_api_user_project)
@@ -43,28 +466,87 @@ def gee_folder_structure():
 
 
 @pytest.fixture(scope="session")
-def gee_test_folder(gee_hash, gee_folder_root, gee_folder_structure):
-    """Create a test folder for the duration of the test session."""
-    folder = utils.init_tree(gee_folder_structure, gee_hash, gee_folder_root)
+def gee_folder_cache():
+    """The folder used to cache the assets of the test folder between sessions.
+
+    The cache is disabled by default, override this fixture to return a folder asset id to enable it.
+    """
+    return None
+
+
+@pytest.fixture(scope="session")
+def gee_test_folder(
+    gee_hash, gee_folder_root, gee_folder_structure, gee_folder_cache, pytestconfig
+):
+    """Create a test folder for the duration of the test session.
+
+    When the tests are distributed with ``pytest-xdist``, the folder is built once by the first worker
+    requesting it and reused by the others. It is deleted by the controller at the end of the session.
+    """
+    from filelock import FileLock
+
+    from . import utils
+
+    # the option is validated when the limiter is configured
+    max_tasks = int(limiter.settings["max_tasks"])
+
+    def build():
+        # evict the outdated assets before reading the cache
+        if gee_folder_cache is not None:
+            max_age = pytestconfig.getini("gee_cache_max_age")
+            max_count = pytestconfig.getini("gee_cache_max_count")
+            utils.prune_cache(
+                gee_folder_cache,
+                max_age=float(max_age) if max_age else None,
+                max_count=int(max_count) if max_count else None,
+            )
+
+        return utils.init_tree(
+            gee_folder_structure, gee_hash, gee_folder_root, max_tasks, gee_folder_cache
+        )
+
+    shared_dir = getattr(pytestconfig, "workerinput", {}).get("gee_shared_dir")
+    if shared_dir is None:
+        folder = build()
+
+        yield folder
 
-    yield folder
+        utils.delete_assets(folder, False)
 
-    utils.delete_assets(folder, False)
+    else:
+        # the folder is registered before being built so that the controller can remove it even if
+        # the build fails. The other workers will not try to build it again.
+        state_file = Path(shared_dir) / "gee_test_folder.json"
+        with FileLock(Path(shared_dir) / "gee_test_folder.lock"):
+            if not state_file.exists():
+                root = PurePosixPath(Path(gee_folder_root).as_posix())
+                state_file.write_text(json.dumps({"folder": f"{root}/{gee_hash}", "ready": False}))
+                folder = build()
+                state_file.write_text(json.dumps({"folder": str(folder), "ready": True}))
+            state = json.loads(state_file.read_text())
+
+        if state["ready"] is False:
+            raise RuntimeError(
+                f"The test folder {state['folder']} failed to build in another worker."
+            )
+
+        yield PurePosixPath(state["folder"])
 
 
 @pytest.fixture
 def ee_list_regression(
-    datadir: Path, original_datadir: Path, request: pytest.FixtureRequest
-) -> ListFixture:
+    datadir: Path, original_datadir: Path, request: pytest.FixtureRequest, gee_init
+) -> Iterator[ListFixture]:
     """Fixture to test :py:class:`ee.List` objects.
 
     Args:
         datadir: The directory where the data files are stored.
         original_datadir: The original data directory.
         request: The pytest request object.
+        gee_init: Wait for the initialization of Earth Engine.
 
-    Returns:
-        The ListFixture object.
+    Yields:
+        The ListFixture object. The asynchronous checks are compared when the test ends.
 
     Example:
         .. code-block:: python
@@ -73,22 +555,29 @@ def ee_list_regression(
                 data = ee.List([1, 2, 3])
                 list_regression.check(data)
     """
-    return ListFixture(datadir, original_datadir, request)
+    from .list_regression import ListFixture
+
+    fixture = ListFixture(datadir, original_datadir, request)
+
+    yield fixture
+
+    fixture.wait()
 
 
 @pytest.fixture
 def ee_feature_collection_regression(
-    datadir: Path, original_datadir: Path, request: pytest.FixtureRequest
-) -> FeatureCollectionFixture:
+    datadir: Path, original_datadir: Path, request: pytest.FixtureRequest, gee_init
+) -> Iterator[FeatureCollectionFixture]:
     """Fixture to test :py:class:`ee.FeatureCollection` objects.
 
     Args:
         datadir: The directory where the data files are stored.
         original_datadir: The original data directory.
         request: The pytest request object.
+        gee_init: Wait for the initialization of Earth Engine.
 
-    Returns:
-        The FeatureCollectionFixture object.
+    Yields:
+        The FeatureCollectionFixture object. The asynchronous checks are compared when the test ends.
 
     Example:
         .. code-block:: python
@@ -97,22 +586,29 @@ def ee_feature_collection_regression(
                 data = ee.FeatureCollection("FAO/GAUL/2015/level0").filter(ee.Filter.eq("ADM0_NAME", "Holy See"))
                 feature_collection_regression.check(data)
     """
-    return FeatureCollectionFixture(datadir, original_datadir, request)
+    from .feature_collection_regression import FeatureCollectionFixture
+
+    fixture = FeatureCollectionFixture(datadir, original_datadir, request)
+
+    yield fixture
+
+    fixture.wait()
 
 
 @pytest.fixture
 def ee_dictionary_regression(
-    datadir: Path, original_datadir: Path, request: pytest.FixtureRequest
-) -> DictionaryFixture:
+    datadir: Path, original_datadir: Path, request: pytest.FixtureRequest, gee_init
+) -> Iterator[DictionaryFixture]:
     """Fixture to test `ee.Dictionary` objects.
 
     Args:
         datadir: The directory where the data files are stored.
         original_datadir: The original data directory.
         request: The pytest request object.
+        gee_init: Wait for the initialization of Earth Engine.
 
-    Returns:
-        The DictionaryFixture object.
+    Yields:
+        The DictionaryFixture object. The asynchronous checks are compared when the test ends.
 
     Example:
         .. code-block:: python
@@ -121,22 +617,29 @@ def ee_dictionary_regression(
                 data = ee.Dictionary({"a": 1, "b": 2})
                 dictionary_regression.check(data)
     """
-    return DictionaryFixture(datadir, original_datadir, request)
+    from .dictionary_regression import DictionaryFixture
+
+    fixture = DictionaryFixture(datadir, original_datadir, request)
+
+    yield fixture
+
+    fixture.wait()
 
 
 @pytest.fixture
 def ee_image_regression(
-    datadir: Path, original_datadir: Path, request: pytest.FixtureRequest
-) -> ImageFixture:
+    datadir: Path, original_datadir: Path, request: pytest.FixtureRequest, gee_init
+) -> Iterator[ImageFixture]:
     """Fixture to test :py:class:`ee.Image` objects.
 
     Args:
         datadir: The directory where the data files are stored.
         original_datadir: The original data directory.
         request: The pytest request object.
+        gee_init: Wait for the initialization of Earth Engine.
 
-    Returns:
-        The ImageFixture object.
+    Yields:
+        The ImageFixture object. The asynchronous checks are compared when the test ends.
 
     Example:
         .. code-block:: python
@@ -145,4 +648,41 @@ def ee_image_regression(
                 data = ee.Image("LANDSAT/LC08/C02/T1_L2/LC08_191031_20210514")
                 image_regression.check(data, scale=1000)
     """
-    return ImageFixture(datadir, original_datadir, request)
+    from .image_regression import ImageFixture
+
+    fixture = ImageFixture(datadir, original_datadir, request)
+
+    yield fixture
+
+    fixture.wait()
+
+
+@pytest.fixture
+def ee_array_regression(
+    datadir: Path, original_datadir: Path, request: pytest.FixtureRequest, gee_init
+) -> Iterator[ArrayFixture]:
+    """Fixture to test the pixel values of :py:class:`ee.Image` objects.
+
+    Args:
+        datadir: The directory where the data files are stored.
+        original_datadir: The original data directory.
+        request: The pytest request object.
+        gee_init: Wait for the initialization of Earth Engine.
+
+    Yields:
+        The ArrayFixture object. The asynchronous checks are compared when the test ends.
+
+    Example:
+        .. code-block:: python
+
+            def test_array_regression(ee_array_regression):
+                data = ee.Image("LANDSAT/LC08/C02/T1_L2/LC08_191031_20210514").select("SR_B4")
+                ee_array_regression.check(data, scale=1000, tolerances={"SR_B4": {"atol": 1}})
+    """
+    from .array_regression import ArrayFixture
+
+    fixture = ArrayFixture(datadir, original_datadir, request)
+
+    yield fixture
+
+    fixture.wait()
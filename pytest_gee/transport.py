@@ -0,0 +1,232 @@
+"""The HTTP transport used by pytest-gee to talk to Earth Engine.
+
+All the Earth Engine traffic of the plugin goes through a single :py:class:`PooledHttp` object: the
+API calls of the helpers and the fixtures once ``ee.Initialize`` received it as ``http_transport``,
+and the token refreshes of the init functions. It exposes the ``httplib2.Http`` interface expected
+by the API client on top of a thread-safe :py:class:`requests.Session` connection pool, retrying
+the failed connections with an exponential backoff. The failed responses are retried by the API
+client itself, retrying them in the transport as well would multiply the attempts and resend the
+requests that are not idempotent. Every request holds a slot of the session
+:py:class:`~pytest_gee.limiter.Limiter` and the quota exhaustions pause the whole session.
+The requests are recorded by the :py:class:`~pytest_gee.instrumentation.Recorder` of the session
+and the ones of the initialization can be kept in the :py:class:`~pytest_gee.cassette.Cassette`.
+
+The module is imported when the plugin is loaded, the HTTP libraries are only imported when the
+transport is created.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+
+from .instrumentation import classify, get_recorder
+from .limiter import get_limiter
+
+if TYPE_CHECKING:
+    import httplib2
+    import requests
+
+    from .cassette import Cassette
+
+QUOTA_STATUS = 429
+"The HTTP status of the quota exhaustions, pausing the limiter until the API client retries them."
+
+settings: Dict[str, float] = {
+    "pool_size": 10,
+    "timeout": 300.0,
+    "connect_timeout": 30.0,
+    "retries": 5,
+    "backoff": 0.5,
+}
+"The settings of the shared transport, changed with :py:func:`configure`."
+
+
+class PooledHttp:
+    """An ``httplib2.Http`` compatible transport based on a pooled, retrying requests session."""
+
+    def __init__(
+        self,
+        pool_size: int = 10,
+        timeout: Optional[float] = 300.0,
+        connect_timeout: Optional[float] = 30.0,
+        retries: int = 5,
+        backoff: float = 0.5,
+    ):
+        """Create the transport and its connection pool.
+
+        Args:
+            pool_size: the maximum number of connections kept open to the same host.
+            timeout: the maximum time to wait for the server response, in seconds.
+            connect_timeout: the maximum time to wait for a connection, in seconds.
+            retries: the number of retries of a failed connection.
+            backoff: the base delay of the exponential backoff between 2 retries, in seconds.
+        """
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        # only the connections are retried, the request was not sent yet so it is safe for every
+        # method. The responses are returned as is to the API client that retries them.
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=0,
+            backoff_factor=backoff,
+            raise_on_status=False,
+            respect_retry_after_header=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        # attributes read by google_auth_httplib2.AuthorizedHttp
+        self.connections: Dict[str, Any] = {}
+        self.follow_redirects = True
+        self.redirect_codes = frozenset((300, 301, 302, 303, 307, 308))
+
+    def request(
+        self,
+        uri: str,
+        method: str = "GET",
+        body: Optional[Any] = None,
+        headers: Optional[dict] = None,
+        redirections: Optional[int] = None,
+        connection_type: Optional[Any] = None,
+    ) -> Tuple[httplib2.Response, bytes]:
+        """Send a request with the ``httplib2.Http.request`` semantics.
+
+        The requests of the initialization are served from the cassette when one is used. The others
+        wait for a slot of the limiter and a quota exhaustion pauses the limiter before the response
+        is returned to the API client. The errors raised once the retries are exhausted are
+        converted to the builtin exceptions that the API client considers as transient.
+
+        Args:
+            uri: the requested url.
+            method: the HTTP method.
+            body: the body of the request.
+            headers: the headers of the request.
+            redirections: ignored, the redirections are followed by the session.
+            connection_type: ignored, the connections are managed by the pool.
+
+        Returns:
+            the response with its headers and status, and its content.
+        """
+        import httplib2
+
+        def send() -> Tuple[int, Dict[str, str], bytes]:
+            response = self._send_limited(uri, method, body, headers)
+            return response.status_code, dict(response.headers), response.content
+
+        if _cassette is not None and _cassette.records(uri):
+            status, response_headers, content = _cassette.fetch_request(method, uri, send)
+        else:
+            status, response_headers, content = send()
+
+        info: Dict[str, Any] = {**response_headers, "status": status}
+        return httplib2.Response(info), content
+
+    def _send_limited(
+        self, uri: str, method: str, body: Optional[Any], headers: Optional[dict]
+    ) -> requests.Response:
+        """Send a request within the limits of the session and record it."""
+        limiter = get_limiter()
+        start = time.perf_counter()
+        with limiter.request():
+            response = self._send(uri, method, body, headers)
+
+        # the rejected request is retried by the API client, its next attempt and all the other
+        # requests of the session wait for the end of the pause
+        if response.status_code == QUOTA_STATUS:
+            limiter.exhausted()
+        else:
+            limiter.recovered()
+
+        size = len(body or b"") + len(response.content)
+        get_recorder().record(classify(method, uri), time.perf_counter() - start, size)
+        return response
+
+    def _send(
+        self, uri: str, method: str, body: Optional[Any], headers: Optional[dict]
+    ) -> requests.Response:
+        """Send a request through the session, the transient failures are retried by the pool."""
+        import requests
+
+        try:
+            return self.session.request(
+                method,
+                uri,
+                data=body,
+                headers=headers,
+                timeout=(self.connect_timeout, self.timeout),
+                allow_redirects=self.follow_redirects,
+            )
+        except (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError) as e:
+            raise ConnectionError(e) from e
+        except requests.exceptions.Timeout as e:
+            raise TimeoutError(e) from e
+
+    def close(self):
+        """Close the connections of the pool."""
+        self.session.close()
+
+
+_transport: Optional[PooledHttp] = None
+_cassette: Optional[Cassette] = None
+_lock = threading.Lock()
+
+
+def configure(**kwargs):
+    """Change the settings of the shared transport.
+
+    The transport already given to ``ee.Initialize`` keeps its settings, the next initialization
+    uses the new ones.
+
+    Args:
+        **kwargs: the new values of the keys of ``settings``.
+    """
+    global _transport
+    unknown = set(kwargs) - set(settings)
+    if unknown:
+        raise ValueError(f"Unknown transport settings: {sorted(unknown)}.")
+    with _lock:
+        settings.update(kwargs)
+        _transport = None
+
+
+def get_transport() -> PooledHttp:
+    """Get the transport shared by all the Earth Engine traffic of pytest-gee.
+
+    Returns:
+        the transport, created with the current ``settings`` on first use.
+    """
+    global _transport
+    with _lock:
+        if _transport is None:
+            _transport = PooledHttp(
+                pool_size=int(settings["pool_size"]),
+                timeout=settings["timeout"],
+                connect_timeout=settings["connect_timeout"],
+                retries=int(settings["retries"]),
+                backoff=settings["backoff"],
+            )
+        return _transport
+
+
+def use_cassette(cassette: Optional[Cassette]):
+    """Keep the responses of the initialization requests in a cassette.
+
+    Args:
+        cassette: the cassette of the session, None to send all the requests to Earth Engine.
+    """
+    global _cassette
+    _cassette = cassette
+
+
+def is_replaying() -> bool:
+    """Whether the initialization responses are served from a cassette instead of Earth Engine."""
+    return _cassette is not None and _cassette.mode == "replay"
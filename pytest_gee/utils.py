@@ -7,23 +7,30 @@
 
 from __future__ import annotations
 
+import concurrent.futures
 import datetime
+import hashlib
 import json
 import os
 import re
+import sqlite3
+import threading
 import time
-from functools import partial
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed
 from pathlib import Path, PurePosixPath
-from typing import List, Optional, Union
+from typing import Any, Callable, Dict, Iterator, List, Optional, Union, cast
 from warnings import warn
 
 import ee
 import pytest
 import yaml
 from deprecated.sphinx import deprecated
-from pytest_regressions.common import check_text_files, perform_regression_check
 from pytest_regressions.data_regression import RegressionYamlDumper
 
+from .instrumentation import get_recorder, serialize
+from .limiter import get_limiter
+
 TASK_FINISHED_STATES: tuple[str, str, str] = (
     ee.batch.Task.State.COMPLETED,
     ee.batch.Task.State.FAILED,
@@ -31,7 +38,76 @@ TASK_FINISHED_STATES: tuple[str, str, str] = (
 )
 
 
-def wait_for_task(task_id: str, timeout: float, log_progress: bool = True):
+TOKEN_MARGIN = datetime.timedelta(minutes=5)
+"The access tokens expiring within this delay are refreshed instead of being reused."
+
+
+def token_cache_dir() -> Path:
+    """The folder where the access tokens are shared between the test processes."""
+    cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_home) / "pytest-gee"
+
+
+def share_access_token(credentials: Any, identity: str) -> Any:
+    """Reuse the access token obtained by another process for the same identity.
+
+    The cache is locked while it is read so that when the token is missing or close to expiry, only
+    the first process refreshes it and all the others reuse it. The credentials keep their ability
+    to refresh themselves once the token expires.
+
+    Args:
+        credentials: the google-auth credentials of the session.
+        identity: a secret identifying the credentials, only its digest is written to the disk.
+
+    Returns:
+        the same credentials with a valid access token.
+    """
+    import google_auth_httplib2
+    from filelock import FileLock
+
+    from .transport import get_transport
+
+    cache_dir = token_cache_dir()
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    key = hashlib.sha256(identity.encode()).hexdigest()
+    cache_file = cache_dir / f"{key}.json"
+
+    with FileLock(cache_dir / f"{key}.lock"):
+        # google-auth uses naive UTC datetimes for the expiry
+        now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        try:
+            cached = json.loads(cache_file.read_text())
+            expiry = datetime.datetime.fromisoformat(cached["expiry"])
+            if expiry - TOKEN_MARGIN > now:
+                credentials.token, credentials.expiry = cached["token"], expiry
+                return credentials
+        except (OSError, ValueError, KeyError):
+            pass
+
+        credentials.refresh(google_auth_httplib2.Request(get_transport()))
+        content = json.dumps({"token": credentials.token, "expiry": credentials.expiry.isoformat()})
+        fd = os.open(cache_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(content)
+
+    return credentials
+
+
+def write_if_changed(path: Path, content: str):
+    """Write a file only if its content changed, atomically.
+
+    Args:
+        path: the file to write.
+        content: the expected content of the file.
+    """
+    if path.is_file() and path.read_text() == content:
+        return
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(content)
+    os.replace(tmp_path, path)
+
+
+def wait_for_task(task_id: str, timeout: float, log_progress: bool = True) -> str:
     """Waits for the specified task to finish, or a timeout to occur.
 
     The method is a workaround for for a warning that we see in all our tests and pipeline.
@@ -41,33 +117,99 @@ def wait_for_task(task_id: str, timeout: float, log_progress: bool = True):
       task_id: The ID of the task to wait for.
       timeout: The maximum time to wait, in seconds.
       log_progress: Whether to log the progress of the task while waiting.
+
+    Returns:
+      The final state of the task.
+    """
+    return wait_for_tasks([task_id], timeout, log_progress)[task_id]
+
+
+def wait_for_tasks(
+    task_ids: List[str], timeout: float, log_progress: bool = True
+) -> Dict[str, str]:
+    """Waits for all the specified tasks to finish, or a timeout to occur.
+
+    The status of all the unfinished tasks is read from a single listing of the operations at each
+    cycle, see :py:func:`get_task_statuses`. The polling interval starts under a second and grows up to 10 seconds so that short tasks are
+    not delayed and long ones do not flood the API. The slots of the session limiter held by the
+    tasks are released when they finish, or when the wait times out.
+
+    Args:
+      task_ids: The IDs of the tasks to wait for.
+      timeout: The maximum time to wait, in seconds.
+      log_progress: Whether to log the progress of the tasks while waiting.
+
+    Returns:
+      The final state of each task.
+
+    Raises:
+      ee.ee_exception.EEException: if one or more tasks failed or were cancelled.
+      TimeoutError: if the tasks are not all finished after ``timeout`` seconds.
     """
     start = time.time()
     elapsed = 0.0
     last_check = 0.0
-    while True:
+    delay = 0.5
+    states: Dict[str, str] = {}
+    errors: Dict[str, str] = {}
+    pending = list(dict.fromkeys(task_ids))
+    limiter = get_limiter()
+    while pending:
         elapsed = time.time() - start
-        status = ee.data.getTaskStatus(task_id)[0]
-        state = status["state"]
-        if state in TASK_FINISHED_STATES:
-            error_message = status.get("error_message", None)
-            print("Task %s ended at state: %s after %.2f seconds" % (task_id, state, elapsed))
-            if error_message:
-                raise ee.ee_exception.EEException("Error: %s" % error_message)
-            return
+        for task_id, status in get_task_statuses(pending).items():
+            state = states[task_id] = status["state"]
+            if state in TASK_FINISHED_STATES:
+                print("Task %s ended at state: %s after %.2f seconds" % (task_id, state, elapsed))
+                error_message = status.get("error_message", None)
+                if error_message or state != ee.batch.Task.State.COMPLETED:
+                    errors[task_id] = error_message or state
+                limiter.finish_task(task_id)
+        pending = [i for i in pending if states[i] not in TASK_FINISHED_STATES]
+        if not pending:
+            break
         if log_progress and elapsed - last_check >= 30:
-            print(
-                "[{:%H:%M:%S}] Current state for task {}: {}".format(
-                    datetime.datetime.now(), task_id, state
+            for task_id in pending:
+                print(
+                    "[{:%H:%M:%S}] Current state for task {}: {}".format(
+                        datetime.datetime.now(), task_id, states[task_id]
+                    )
                 )
-            )
             last_check = elapsed
         remaining = timeout - elapsed
-        if remaining > 0:
-            time.sleep(min(10, remaining))
-        else:
-            break
-    print("Wait for task %s timed out after %.2f seconds" % (task_id, elapsed))
+        if remaining <= 0:
+            # the tasks still running are not tracked by the limiter anymore
+            for task_id in pending:
+                limiter.finish_task(task_id)
+            raise TimeoutError(
+                "Wait for task(s) %s timed out after %.2f seconds" % (", ".join(pending), elapsed)
+            )
+        time.sleep(min(delay, remaining))
+        delay = min(delay * 1.5, 10)
+
+    if errors:
+        msg = "\n".join(f"- {task_id}: {error}" for task_id, error in errors.items())
+        raise ee.ee_exception.EEException(f"{len(errors)} task(s) failed:\n{msg}")
+
+    return states
+
+
+def get_task_statuses(task_ids: List[str]) -> Dict[str, dict]:
+    """Get the status of several tasks with a single call to ``ee.data.getTaskStatus``.
+
+    Only the given tasks are polled: the call sends one request per task, so callers should only
+    pass the tasks that are still pending.
+
+    Args:
+      task_ids: The IDs of the tasks.
+
+    Returns:
+      The status of each task in the legacy task format, with an ``UNKNOWN`` state for the tasks
+      that do not exist.
+    """
+    if not task_ids:
+        return {}
+    statuses = {status["id"]: status for status in ee.data.getTaskStatus(task_ids)}
+    return {i: statuses.get(i, {"id": i, "state": "UNKNOWN"}) for i in task_ids}
 
 
 @deprecated(version="0.3.5", reason="Use the vanilla GEE ``wait_for_task`` function instead.")
@@ -103,28 +245,124 @@ def get_task(task_descripsion: str) -> Optional[ee.batch.Task]:
     return task
 
 
-def get_assets(folder: Union[str, Path]) -> List[dict]:
+def get_assets(folder: Union[str, Path], max_workers: int = 10) -> List[dict]:
     """Get all the assets from the parameter folder. every nested asset will be displayed.
 
     Args:
         folder: the initial GEE folder
+        max_workers: the maximum number of containers listed at the same time.
 
     Returns:
         the asset list. each asset is a dict with 3 keys: 'type', 'name' and 'id'
     """
-    # set the folder and init the list
-    asset_list: list = []
+    return list(iter_assets(folder, max_workers))
+
+
+def iter_assets(
+    folder: Union[str, Path], max_workers: int = 10, page_size: int = 1000
+) -> Iterator[dict]:
+    """Iterate over all the assets from the parameter folder. every nested asset will be yielded.
+
+    The tree is explored breadth-first: every container is listed page by page in a pool of threads
+    and its content is yielded as soon as it is received so callers can start working before the whole
+    tree is known.
+
+    Args:
+        folder: the initial GEE folder
+        max_workers: the maximum number of containers listed at the same time.
+        page_size: the number of assets requested in each page.
+
+    Yields:
+        the assets. each asset is a dict with 3 keys: 'type', 'name' and 'id'
+    """
     folder = folder if isinstance(folder, str) else folder.as_posix()
 
-    # recursive function to get all the assets
-    def _recursive_get(folder, asset_list):
-        for asset in ee.data.listAssets({"parent": folder})["assets"]:
-            asset_list.append(asset)
-            if asset["type"] in ["FOLDER", "IMAGE_COLLECTION"]:
-                asset_list = _recursive_get(asset["name"], asset_list)
-        return asset_list
+    # list all the pages of a single container
+    def _list(parent: str) -> List[dict]:
+        assets: list = []
+        params = {"parent": parent, "pageSize": page_size}
+        while True:
+            response = ee.data.listAssets(dict(params))
+            assets.extend(response.get("assets", []))
+            if "nextPageToken" not in response:
+                return assets
+            params["pageToken"] = response["nextPageToken"]
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = {executor.submit(_list, folder)}
+        while futures:
+            done, futures = concurrent.futures.wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                for asset in future.result():
+                    if asset["type"] in ["FOLDER", "IMAGE_COLLECTION"]:
+                        futures.add(executor.submit(_list, asset["name"]))
+                    yield asset
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def iter_pages(
+    collection: ee.FeatureCollection,
+    count: int,
+    page_size: int = 1000,
+    fetch: Optional[Callable[[ee.ComputedObject], Any]] = None,
+    max_workers: int = 10,
+) -> Iterator[dict]:
+    """Iterate over the pages of a feature collection.
+
+    Each page is a ``toList(page_size, offset)`` slice of the collection fetched in a pool of threads.
+    At most ``max_workers`` pages are requested ahead of the consumer so that only a few of them are
+    held in memory at the same time.
+
+    Args:
+        collection: the feature collection to fetch.
+        count: the number of features in the collection.
+        page_size: the number of features in each page.
+        fetch: the function fetching a page from Earth Engine, ``getInfo`` by default.
+        max_workers: the maximum number of pages fetched at the same time.
+
+    Yields:
+        the GeoJSON FeatureCollection of each page, in the order of the collection.
+    """
+    fetch = fetch or (lambda page: page.getInfo())
+    offsets = iter(range(0, count, page_size))
+
+    def _page(offset: int) -> ee.FeatureCollection:
+        return ee.FeatureCollection(collection.toList(page_size, offset))
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures: deque = deque()
+        for offset in offsets:
+            futures.append(executor.submit(fetch, _page(offset)))
+            if len(futures) == max_workers:
+                break
+        while futures:
+            page = futures.popleft().result()
+            next_offset = next(offsets, None)
+            if next_offset is not None:
+                futures.append(executor.submit(fetch, _page(next_offset)))
+            yield page
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def asset_exists(asset_id: Union[str, PurePosixPath]) -> bool:
+    """Check if an asset exists.
+
+    Args:
+        asset_id: the asset to look for
 
-    return _recursive_get(folder, asset_list)
+    Returns:
+        True if the asset exists
+    """
+    asset_id = asset_id if isinstance(asset_id, str) else asset_id.as_posix()
+    try:
+        ee.data.getAsset(asset_id)
+    except ee.ee_exception.EEException:
+        return False
+    return True
 
 
 def export_asset(
@@ -140,6 +378,26 @@ def export_asset(
     Returns:
         the path of the created asset
     """
+    # launch the task and wait for the end of exportation
+    task = _start_export(object, asset_id, description)
+    wait_for_task(task.id, 10 * 60, False)
+
+    return PurePosixPath(asset_id if isinstance(asset_id, str) else asset_id.as_posix())
+
+
+def _start_export(
+    object: ee.ComputedObject, asset_id: Union[str, Path], description: str
+) -> ee.batch.Task:
+    """Start the export of an asset to the GEE platform without waiting for its end.
+
+    Args:
+        object: the object to export
+        asset_id: the name of the asset to create
+        description: the description of the task
+
+    Returns:
+        the started task
+    """
     # convert the asset_id to a string note that GEE only supports unix style separator
     asset_id = asset_id if isinstance(asset_id, str) else asset_id.as_posix()
 
@@ -159,11 +417,8 @@ def export_asset(
     else:
         raise ValueError("Only ee.Image and ee.FeatureCollection are supported")
 
-    # launch the task and wait for the end of exportation
-    task.start()
-    wait_for_task(task.id, 10 * 60, False)
-
-    return PurePosixPath(asset_id)
+    # the task holds a slot of the session limiter until it is seen finished
+    return get_limiter().start_task(task)
 
 
 def _create_container(asset_request: str) -> str:
@@ -194,17 +449,28 @@ def _create_container(asset_request: str) -> str:
     return asset_id
 
 
-def init_tree(structure: dict, prefix: str, root: Union[str, PurePosixPath]) -> PurePosixPath:
+def init_tree(
+    structure: dict,
+    prefix: str,
+    root: Union[str, PurePosixPath],
+    max_tasks: int = 10,
+    cache: Union[str, PurePosixPath, None] = None,
+) -> PurePosixPath:
     """Create an EarthEngine folder tree from a dictionary.
 
     The input ditionary should described the structure of the folder you want to create.
     The keys are the folder names and the values are the subfolders.
     Once you reach an ``ee.FeatureCollection`` and/or an ``ee.Image`` set it in the dictionary and the function will export the object.
 
+    All the containers are created first, then the export tasks are started without waiting for each other.
+    At most ``max_tasks`` exports are running at the same time so the whole tree is ready in roughly the time of the slowest export.
+
     Args:
         structure: the structure of the folder to create
         prefix: the prefix to use on every item (folder, tasks, asset_id, etc.)
         root: the root folder of the test where to create the test folder.
+        max_tasks: the maximum number of export tasks running at the same time, at least 1.
+        cache: an optional folder used as a content-addressed cache. The leaves are exported there once and copied in the test folder in the next sessions.
 
     Returns:
         the path of the created folder
@@ -218,8 +484,9 @@ def init_tree(structure: dict, prefix: str, root: Union[str, PurePosixPath]) ->
         ... }
         ... init_tree(structure, "toto")
     """
+    # recursive function to create the containers and gather the leaves to export
+    exports: list = []
 
-    # recursive function to create the folder tree
     def _recursive_create(structure, prefix, folder):
         for name, content in structure.items():
             asset_id = PurePosixPath(folder) / name
@@ -228,7 +495,7 @@ def init_tree(structure: dict, prefix: str, root: Union[str, PurePosixPath]) ->
                 asset_id = _create_container(str(asset_id))
                 _recursive_create(content, prefix, asset_id)
             else:
-                export_asset(content, asset_id, description)
+                exports.append((content, asset_id, description))
 
     # create the root folder
     root = PurePosixPath(root) if isinstance(root, str) else root
@@ -238,16 +505,167 @@ def init_tree(structure: dict, prefix: str, root: Union[str, PurePosixPath]) ->
     # start the recursive function
     _recursive_create(structure, prefix, root_folder)
 
+    # export the leaves directly or through the cache
+    if cache is None:
+        _run_exports(exports, max_tasks)
+    else:
+        _run_cached_exports(exports, cache, prefix, max_tasks)
+
     return PurePosixPath(root_folder)
 
 
-def delete_assets(asset_id: Union[str, Path], dry_run: bool = True) -> list:
+def _run_exports(exports: list, max_tasks: int, timeout: float = 10 * 60):
+    """Run the exports and wait for all of them.
+
+    The exports are started without waiting for them. When the cap is reached, all the running
+    tasks are polled together and a new export is started as soon as any of them finishes. The
+    failures do not stop the other exports, they are all reported at the end.
+
+    Args:
+        exports: the list of (object, asset_id, description) to export
+        max_tasks: the maximum number of export tasks running at the same time.
+        timeout: the maximum time to wait for each task, in seconds.
+
+    Raises:
+        ee.ee_exception.EEException: if one or more tasks failed or were cancelled.
+        TimeoutError: if a task is not finished after ``timeout`` seconds.
+    """
+    # the tasks can only be started within the limit of the session
+    limiter = get_limiter()
+    max_tasks = min(max_tasks, limiter.max_tasks or max_tasks)
+    queue = deque(exports)
+    running: Dict[str, float] = {}
+    errors: Dict[str, str] = {}
+    delay = 0.5
+    try:
+        while queue or running:
+            while queue and len(running) < max_tasks:
+                # a started task always has an id
+                task = _start_export(*queue.popleft())
+                running[cast(str, task.id)] = time.time()
+                delay = 0.5
+
+            time.sleep(delay)
+            delay = min(delay * 1.5, 10)
+            for task_id, status in get_task_statuses(list(running)).items():
+                state = status["state"]
+                if state in TASK_FINISHED_STATES:
+                    del running[task_id]
+                    limiter.finish_task(task_id)
+                    error_message = status.get("error_message", None)
+                    if error_message or state != ee.batch.Task.State.COMPLETED:
+                        errors[task_id] = error_message or state
+
+            late = [i for i, start in running.items() if time.time() - start > timeout]
+            if late:
+                raise TimeoutError(
+                    "Wait for task(s) %s timed out after %.2f seconds" % (", ".join(late), timeout)
+                )
+    finally:
+        # the tasks still running when an error stops the wait are not tracked anymore
+        for task_id in running:
+            limiter.finish_task(task_id)
+
+    if errors:
+        msg = "\n".join(f"- {task_id}: {error}" for task_id, error in errors.items())
+        raise ee.ee_exception.EEException(f"{len(errors)} task(s) failed:\n{msg}")
+
+
+def _run_cached_exports(
+    exports: list, cache: Union[str, PurePosixPath], prefix: str, max_tasks: int
+):
+    """Run the exports through a content-addressed cache folder.
+
+    Each leaf is identified by the digest of its serialized graph. The missing ones are first exported
+    to the cache and then every leaf is copied from the cache to its destination.
+
+    Args:
+        exports: the list of (object, asset_id, description) to export
+        cache: the cache folder
+        prefix: the prefix to use on every task description
+        max_tasks: the maximum number of export and copy requests running at the same time.
+    """
+    cache = cache if isinstance(cache, str) else cache.as_posix()
+
+    # create the cache folder on first use and read its content
+    asset_exists(cache) or ee.data.createFolder(cache)
+    cached = {a["name"].split("/")[-1] for a in iter_assets(cache, max_tasks)}
+
+    # export the missing leaves to the cache, identical leaves are only exported once
+    copies, misses = [], {}
+    for content, asset_id, _ in exports:
+        key = asset_digest(content)
+        copies.append((f"{cache}/{key}", PurePosixPath(asset_id).as_posix()))
+        if key not in cached and key not in misses:
+            misses[key] = (content, f"{cache}/{key}", f"{prefix}_cache_{key[:16]}")
+
+    try:
+        _run_exports(list(misses.values()), max_tasks)
+    except ee.ee_exception.EEException as e:
+        # another session may have filled the cache at the same time, in which case the export
+        # fails because the asset already exists
+        if not all(asset_exists(cache_id) for _, cache_id, _ in misses.values()):
+            raise e
+
+    # copy the cached assets into the session folder
+    with ThreadPoolExecutor(max_workers=max_tasks) as executor:
+        list(executor.map(lambda c: ee.data.copyAsset(*c), copies))
+
+
+def asset_digest(object: ee.ComputedObject) -> str:
+    """Compute the digest identifying an exported object in the cache.
+
+    Args:
+        object: the object to export
+
+    Returns:
+        the sha256 digest of the serialized object
+    """
+    return hashlib.sha256(serialize(object).encode()).hexdigest()
+
+
+def prune_cache(
+    cache: Union[str, PurePosixPath],
+    max_age: Optional[float] = None,
+    max_count: Optional[int] = None,
+) -> list:
+    """Remove the old assets from the cache folder.
+
+    Args:
+        cache: the cache folder
+        max_age: the maximum age of a cached asset in days. Older assets are deleted.
+        max_count: the maximum number of cached assets. The oldest ones are deleted first.
+
+    Returns:
+        the list of deleted assets
+    """
+    cache = cache if isinstance(cache, str) else cache.as_posix()
+    if not asset_exists(cache):
+        return []
+
+    # sort the assets from the most recent to the oldest
+    assets = sorted(iter_assets(cache), key=lambda a: a["updateTime"], reverse=True)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    to_delete = assets[max_count:] if max_count is not None else []
+    if max_age is not None:
+        limit = (now - datetime.timedelta(days=max_age)).strftime("%Y-%m-%dT%H:%M:%S")
+        to_delete += [a for a in assets if a["updateTime"] < limit and a not in to_delete]
+
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        list(executor.map(ee.data.deleteAsset, [a["name"] for a in to_delete]))
+
+    return [a["name"] for a in to_delete]
+
+
+def delete_assets(asset_id: Union[str, Path], dry_run: bool = True, max_workers: int = 10) -> list:
     """Delete the selected asset and all its content.
 
     This method will delete all the files and folders existing in an asset folder.
     By default a dry run will be launched and if you are satisfyed with the displayed names, change the ``dry_run`` variable to ``False``.
     No other warnng will be displayed.
 
+    The assets of a same nesting level are deleted concurrently, the next level is only processed once the current one is empty.
+
     .. warning::
 
         If this method is used on the root directory you will loose all your data, it's highly recommended to use a dry run first and carefully review the destroyed files.
@@ -255,46 +673,59 @@ def delete_assets(asset_id: Union[str, Path], dry_run: bool = True) -> list:
     Args:
         asset_id: the Id of the asset or a folder
         dry_run: whether or not a dry run should be launched. dry run will only display the files name without deleting them.
+        max_workers: the maximum number of deletions running at the same time.
 
     Returns:
         a list of all the files deleted or to be deleted
+
+    Raises:
+        ee.ee_exception.EEException: if some assets could not be deleted.
     """
     # convert the asset_id to a string
     asset_id = asset_id if isinstance(asset_id, str) else asset_id.as_posix()
 
     # define a delete function to change the behaviour of the method depending of the mode
-    # in dry mode, the function only store the assets to be destroyed as a dictionary.
-    # in non dry mode, the function store the asset names in a dictionary AND delete them.
-    output = []
-
-    def delete(id: str):
-        output.append(id)
-        dry_run is True or ee.data.deleteAsset(id)
+    # in dry mode, the function only store the assets to be destroyed.
+    # in non dry mode, the function store the asset names AND delete them.
+    output: list = []
+    errors: dict = {}
+
+    def delete(ids: List[str]):
+        output.extend(ids)
+        if dry_run is True:
+            return
+        # the level is a barrier: we wait for every deletion before moving to the parents
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(ee.data.deleteAsset, id): id for id in ids}
+            for future in as_completed(futures):
+                if future.exception() is not None:
+                    errors[futures[future]] = future.exception()
 
     # identify the type of asset
     asset_info = ee.data.getAsset(asset_id)
 
     if asset_info["type"] in ["FOLDER", "IMAGE_COLLECTION"]:
-        # get all the assets
-        asset_list = get_assets(folder=asset_id)
-
-        # split the files by nesting levels
+        # split the files by nesting levels while they are listed
         # we will need to delete the more nested files first
         assets_ordered: dict = {}
-        for asset in asset_list:
+        for asset in iter_assets(asset_id, max_workers):
             lvl = len(asset["id"].split("/"))
             assets_ordered.setdefault(lvl, [])
             assets_ordered[lvl].append(asset)
 
         # delete all items starting from the more nested ones
-        assets_ordered = dict(sorted(assets_ordered.items(), reverse=True))
-        print(assets_ordered)
-        for lvl in assets_ordered:
-            for i in assets_ordered[lvl]:
-                delete(i["name"])
+        # parents cannot be deleted if one of their children failed so we stop at the first error
+        for lvl in sorted(assets_ordered, reverse=True):
+            delete([i["name"] for i in assets_ordered[lvl]])
+            if errors:
+                break
 
     # delete the initial folder/asset
-    delete(asset_id)
+    errors or delete([asset_id])
+
+    if errors:
+        msg = "\n".join(f"- {id}: {error}" for id, error in errors.items())
+        raise ee.ee_exception.EEException(f"{len(errors)} asset(s) could not be deleted:\n{msg}")
 
     return output
 
@@ -354,57 +785,309 @@ def build_fullpath(
     return filename
 
 
+LEAF_VALUES = ("constantValue", "integerValue", "bytesValue", "argumentReference")
+"The value nodes of a serialized graph that have no children."
+
+
+def canonicalize_graph(graph: dict) -> dict:
+    """Rewrite a serialized Earth Engine graph in a deterministic form.
+
+    The ids of the values produced by :py:meth:`ee.ComputedObject.serialize` depend on the construction
+    order of the objects. The graph is rebuilt from the content of its nodes: identical subexpressions
+    are merged, the ones used several times are extracted and every value is renumbered in a pre-order
+    walk of the sorted arguments. Two semantically identical computations built in a different order
+    get the same canonical graph.
+
+    Args:
+        graph: the serialized graph as returned by ``json.loads(object.serialize())``
+
+    Returns:
+        the canonical graph
+    """
+    # only the cloud API expression format can be canonicalized
+    if not isinstance(graph, dict) or set(graph) != {"result", "values"}:
+        return graph
+
+    values = graph["values"]
+    nodes: Dict[str, dict] = {}
+    children: Dict[str, List[str]] = {}
+    references: Dict[str, str] = {}
+
+    # replace every value node by the digest of its content, children being replaced by their own digest
+    def _digest(node: dict) -> str:
+        if "valueReference" in node:
+            ref = node["valueReference"]
+            if ref not in references:
+                references[ref] = _digest(values[ref])
+            return references[ref]
+
+        kind, content = next(iter(node.items()))
+        kids: List[str] = []
+        if kind in LEAF_VALUES:
+            normalized = node
+        elif kind == "arrayValue":
+            kids = [_digest(v) for v in content.get("values", [])]
+            normalized = {kind: {"values": kids}}
+        elif kind == "dictionaryValue":
+            items = content.get("values", {})
+            kids = [_digest(items[k]) for k in sorted(items)]
+            normalized = {kind: {"values": dict(zip(sorted(items), kids))}}
+        elif kind == "functionDefinitionValue":
+            kids = [_digest({"valueReference": content["body"]})]
+            normalized = {kind: {"argumentNames": content["argumentNames"], "body": kids[0]}}
+        elif kind == "functionInvocationValue":
+            arguments = content.get("arguments", {})
+            kids = [_digest(arguments[k]) for k in sorted(arguments)]
+            normalized = {kind: {"arguments": dict(zip(sorted(arguments), kids))}}
+            if "functionReference" in content:
+                kids.append(_digest({"valueReference": content["functionReference"]}))
+                normalized[kind]["functionReference"] = kids[-1]
+            else:
+                normalized[kind]["functionName"] = content["functionName"]
+        else:
+            raise ValueError(f"Unknown value node {kind} in the serialized graph.")
+
+        digest = hashlib.sha256(json.dumps(normalized, sort_keys=True).encode()).hexdigest()
+        if digest not in nodes:
+            nodes[digest], children[digest] = normalized, kids
+        return digest
+
+    root = _digest({"valueReference": graph["result"]})
+
+    # count how many times each unique node is used and force the extraction of the nodes that
+    # need to be referenced by id in the format
+    counts: Dict[str, int] = {}
+    forced = {root}
+    for digest, kids in children.items():
+        for kid in kids:
+            counts[kid] = counts.get(kid, 0) + 1
+        content = next(iter(nodes[digest].values()))
+        for key in ("body", "functionReference"):
+            if isinstance(content, dict) and key in content:
+                forced.add(content[key])
+
+    # rebuild the graph, renumbering the extracted nodes in pre-order
+    ids: Dict[str, str] = {}
+    canonical: Dict[str, dict] = {}
+
+    def _emit(digest: str) -> dict:
+        if digest in ids:
+            return {"valueReference": ids[digest]}
+        kind, content = next(iter(nodes[digest].items()))
+        extracted = digest in forced or (kind not in LEAF_VALUES and counts[digest] > 1)
+        if extracted:
+            ids[digest] = str(len(ids))
+
+        if kind in LEAF_VALUES:
+            node = nodes[digest]
+        elif kind == "arrayValue":
+            node = {kind: {"values": [_emit(d) for d in content["values"]]}}
+        elif kind == "dictionaryValue":
+            node = {kind: {"values": {k: _emit(d) for k, d in content["values"].items()}}}
+        elif kind == "functionDefinitionValue":
+            body = _emit(content["body"])["valueReference"]
+            node = {kind: {"argumentNames": content["argumentNames"], "body": body}}
+        else:
+            arguments = {k: _emit(d) for k, d in content["arguments"].items()}
+            node = {kind: {"arguments": arguments}}
+            if "functionReference" in content:
+                node[kind]["functionReference"] = _emit(content["functionReference"])[
+                    "valueReference"
+                ]
+            else:
+                node[kind]["functionName"] = content["functionName"]
+
+        if not extracted:
+            return node
+        canonical[ids[digest]] = node
+        return {"valueReference": ids[digest]}
+
+    result = _emit(root)["valueReference"]
+    return {"result": result, "values": canonical}
+
+
+class SerializedGraph:
+    """The serialized graph of an Earth Engine object and its digest.
+
+    The graph is serialized, canonicalized and hashed once so that it can be checked, written and
+    used as cassette key several times.
+    """
+
+    def __init__(self, object: ee.ComputedObject):
+        """Serialize the object and compute its digest.
+
+        Args:
+            object: the earthengine object to serialize
+        """
+        serialized = serialize(object)
+        self.size = len(serialized)
+        self.data = canonicalize_graph(json.loads(serialized))
+        canonical = json.dumps(self.data, sort_keys=True, separators=(",", ":"))
+        self.digest = hashlib.sha256(canonical.encode()).hexdigest()
+
+    def dump(self, filename: Path):
+        """Dump the graph to the given filename with its digest as a header comment."""
+        dumped_str = yaml.dump_all(
+            [self.data],
+            Dumper=RegressionYamlDumper,
+            default_flow_style=False,
+            allow_unicode=True,
+            indent=2,
+            encoding="utf-8",
+        )
+        filename.parent.mkdir(parents=True, exist_ok=True)
+        filename.write_bytes(f"{DIGEST_HEADER}{self.digest}\n".encode() + dumped_str)
+
+
+DIGEST_HEADER = "# digest: "
+"The header line storing the digest of a serialized graph file."
+
+
+def read_digest(path: Path) -> Optional[str]:
+    """Read the digest of a serialized graph file.
+
+    Only the header line is read. Files written before the header existed are parsed, canonicalized and hashed.
+
+    Args:
+        path: the serialized graph file
+
+    Returns:
+        the digest of the stored graph or None if the file does not exist
+    """
+    if not path.is_file():
+        return None
+
+    with path.open(encoding="utf-8") as f:
+        line = f.readline()
+    if line.startswith(DIGEST_HEADER):
+        return line[len(DIGEST_HEADER) :].strip()
+
+    data = canonicalize_graph(yaml.safe_load(path.read_text(encoding="utf-8")))
+    canonical = json.dumps(data, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class SerializedStore:
+    """The serialized graphs of a directory stored in a single SQLite file.
+
+    The file is only opened on the first lookup and each write is a single transaction so that
+    concurrent sessions (e.g. ``pytest-xdist`` workers) never see a partial update.
+    """
+
+    FILENAME = "serialized.sqlite"
+    "The name of the store file in each data directory."
+
+    _local = threading.local()
+
+    def __init__(self, directory: Path):
+        """Create the store of a data directory.
+
+        Args:
+            directory: the data directory of the checks
+        """
+        self.path = directory / self.FILENAME
+
+    def _connect(self) -> sqlite3.Connection:
+        """Get the connection of the current thread, creating the database on first use."""
+        if not hasattr(self._local, "connections"):
+            self._local.connections = {}
+        connections = self._local.connections
+        if self.path not in connections:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30)
+            with connection:
+                connection.execute(
+                    "CREATE TABLE IF NOT EXISTS graphs "
+                    "(name TEXT PRIMARY KEY, digest TEXT NOT NULL, data TEXT NOT NULL)"
+                )
+            connections[self.path] = connection
+        return connections[self.path]
+
+    def get(self, name: str) -> Optional[str]:
+        """Get the digest stored for a check or None if it's not registered."""
+        if not self.path.is_file():
+            return None
+        query = "SELECT digest FROM graphs WHERE name = ?"
+        row = self._connect().execute(query, (name,)).fetchone()
+        return row[0] if row else None
+
+    def put(self, name: str, graph: SerializedGraph):
+        """Register the graph of a check."""
+        query = "INSERT OR REPLACE INTO graphs (name, digest, data) VALUES (?, ?, ?)"
+        with self._connect() as connection:
+            connection.execute(query, (name, graph.digest, json.dumps(graph.data, sort_keys=True)))
+
+    def delete(self, name: str):
+        """Remove the graph of a check."""
+        if self.path.is_file():
+            with self._connect() as connection:
+                connection.execute("DELETE FROM graphs WHERE name = ?", (name,))
+
+
+def get_store(path: Path, request: pytest.FixtureRequest) -> Optional[SerializedStore]:
+    """Get the store holding a serialized graph file if the ``sqlite`` store is enabled.
+
+    Args:
+        path: the full path to the serialized graph file.
+        request: Pytest request object.
+
+    Returns:
+        the store of the file directory or None if the graphs are stored in individual files.
+    """
+    store = request.config.getini("gee_serialized_store")
+    if store not in ("files", "sqlite"):
+        raise ValueError(f"gee_serialized_store should be 'files' or 'sqlite', got {store}.")
+    return SerializedStore(path.parent) if store == "sqlite" else None
+
+
+def delete_serialized(path: Path, request: pytest.FixtureRequest):
+    """Delete a registered serialized graph.
+
+    Args:
+        path: the full path to the serialized graph file.
+        request: Pytest request object.
+    """
+    store = get_store(path, request)
+    store is None or store.delete(path.name)
+    path.unlink(missing_ok=True)
+
+
 def check_serialized(
-    object: ee.ComputedObject,
+    object: Union[ee.ComputedObject, SerializedGraph],
     path: Path,
-    datadir: Path,
-    original_datadir: Path,
     request: pytest.FixtureRequest,
     force_regen: bool = False,
-    with_test_class_names: bool = False,
 ):
     """Check if the serialized GEE object is the same as the saved one.
 
+    Only the digests of the graphs are compared, the file is written only when ``force_regen`` is set.
+    When the ``sqlite`` store is enabled, the graph is registered in the store of the file directory
+    instead, files written before are still read until they are regenerated.
+
     Args:
-        object: the earthnegine object to check
+        object: the earthnegine object to check or its already serialized graph
         path: the full path to the file to check against.
-        datadir: Fixture embed_data.
-        original_datadir: Fixture embed_data.
         request: Pytest request object.
         force_regen: if True, the file will be regenerated even if it exists.
-        with_test_class_names: if true it will use the test class name (if any) to compose the basename.
 
     Raise:
         AssertionError if the serialized object is different from the saved one.
     """
-    # serialize the object# extract the data from the computed object
-    data_dict = json.loads(object.serialize())
+    graph = object if isinstance(object, SerializedGraph) else SerializedGraph(object)
+    store = get_store(path, request)
 
-    # delete the file upstream if force_regen is set
     if force_regen is True:
-        path.unlink(missing_ok=True)
-
-    def dump(filename: Path) -> None:
-        """Dump dict contents to the given filename."""
-        dumped_str = yaml.dump_all(
-            [data_dict],
-            Dumper=RegressionYamlDumper,
-            default_flow_style=False,
-            allow_unicode=True,
-            indent=2,
-            encoding="utf-8",
-        )
-        filename.write_bytes(dumped_str)
-
-    # check the previously registered serialized call from GEE. If it matches the current call,
-    # we don't need to check the data
-    perform_regression_check(
-        datadir=datadir,
-        original_datadir=original_datadir,
-        request=request,
-        check_fn=partial(check_text_files, encoding="UTF-8"),
-        dump_fn=dump,
-        extension=".yml",
-        fullpath=path,
-        with_test_class_names=with_test_class_names,
-    )
+        if store is None:
+            graph.dump(path)
+        else:
+            store.put(path.name, graph)
+            path.unlink(missing_ok=True)
+        return
+
+    # the regeneration options of pytest-regressions force the fixtures to fetch the data again
+    regen = request.config.getoption("force_regen") or request.config.getoption("regen_all")
+    digest = store.get(path.name) if store is not None else None
+    digest = digest or read_digest(path)
+    get_recorder().cache(not regen and digest == graph.digest)
+    if regen or digest != graph.digest:
+        raise AssertionError(f"The serialized graph does not match {path}")
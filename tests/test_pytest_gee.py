@@ -1,8 +1,41 @@
 """Test the pytest_gee package."""
 
+import datetime
+import http.server
+import io
+import json
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path, PurePosixPath
+from types import SimpleNamespace
+
 import ee
+import geopandas as gpd
+import numpy as np
+import pytest
+import yaml
+from pytest_regressions.data_regression import RegressionYamlDumper
 
 import pytest_gee
+from pytest_gee.array_regression import compare_arrays
+from pytest_gee.cassette import CASSETTE_KEY, Cassette
+from pytest_gee.comparison import (
+    check_features,
+    check_text_lines,
+    compare_data,
+    compare_features,
+    flatten_data,
+)
+from pytest_gee.deferred import EXECUTOR_KEY, DeferrableFixture, DeferredBatch
+from pytest_gee.feature_collection_regression import FeatureCollectionFixture, dump_pages
+from pytest_gee.initialization import INIT_KEY, BackgroundInit
+from pytest_gee.instrumentation import Recorder, classify, summarize
+from pytest_gee.limiter import Limiter
+from pytest_gee.plugin import _compare_pending, pytest_itemcollected
+from pytest_gee.transport import PooledHttp
 
 landsat_image = "LANDSAT/LC08/C02/T1_L2/LC08_191031_20240607"
 "landsat image from 2024-06-07 on top of Rome"
@@ -129,3 +162,937 @@ def test_image_regression_with_overlay(ee_image_regression):
         [ee.Feature(centroid, {"style": {"color": "red", "pointShape": "plus", "pointSize": 10}})]
     )
     ee_image_regression.check(image, scale=100, region=centroid.buffer(20000), overlay=overlay)
+
+
+def test_canonicalize_graph():
+    """Test that the same computation built in a different order gets the same canonical graph."""
+    g = {"functionInvocationValue": {"functionName": "G", "arguments": {"x": {"constantValue": 1}}}}
+    graph = {
+        "result": "0",
+        "values": {
+            "0": {
+                "functionInvocationValue": {
+                    "functionName": "F",
+                    "arguments": {"a": {"valueReference": "1"}, "b": {"valueReference": "2"}},
+                }
+            },
+            "1": g,
+            "2": g,
+        },
+    }
+    reordered = {
+        "result": "5",
+        "values": {
+            "5": {
+                "functionInvocationValue": {
+                    "functionName": "F",
+                    "arguments": {"b": {"valueReference": "7"}, "a": g},
+                }
+            },
+            "7": g,
+        },
+    }
+    canonical = pytest_gee.utils.canonicalize_graph(graph)
+    assert canonical == pytest_gee.utils.canonicalize_graph(reordered)
+    assert canonical["values"]["1"] == g
+    assert canonical["values"]["0"]["functionInvocationValue"]["arguments"] == {
+        "a": {"valueReference": "1"},
+        "b": {"valueReference": "1"},
+    }
+
+
+def test_read_digest(tmp_path):
+    """Test that the files without digest header are hashed from their canonical graph."""
+    graph = pytest_gee.utils.SerializedGraph(_FakeObject(1))
+    path = tmp_path / "serialized_test.yml"
+    assert pytest_gee.utils.read_digest(path) is None
+
+    graph.dump(path)
+    assert path.read_text().startswith(f"# digest: {graph.digest}\n")
+    assert pytest_gee.utils.read_digest(path) == graph.digest
+
+    # a legacy file holds the raw graph, with other value ids
+    legacy = {"result": "3", "values": {"3": {"constantValue": 1}}}
+    path.write_text(yaml.dump(legacy))
+    assert pytest_gee.utils.read_digest(path) == graph.digest
+
+
+def test_check_serialized(tmp_path):
+    """Test that a registered graph short-circuits the check without serializing it again."""
+    options = {"force_regen": False, "regen_all": False}
+    config = SimpleNamespace(getini=lambda name: "sqlite", getoption=options.get)
+    request = SimpleNamespace(config=config)
+    path = tmp_path / "serialized_test.yml"
+    object = _CountedObject(1)
+    graph = pytest_gee.utils.SerializedGraph(object)
+
+    # a legacy file is still read until the graph is registered in the store
+    path.write_text(yaml.dump({"result": "3", "values": {"3": {"constantValue": 1}}}))
+    pytest_gee.utils.check_serialized(graph, path, request)
+    pytest_gee.utils.check_serialized(graph, path, request, force_regen=True)
+    assert not path.exists()
+    pytest_gee.utils.check_serialized(graph, path, request)
+    assert object.serialized == 1
+
+    # a changed graph or the regeneration options force the data to be fetched again
+    with pytest.raises(AssertionError):
+        pytest_gee.utils.check_serialized(_FakeObject(2), path, request)
+    options["force_regen"] = True
+    with pytest.raises(AssertionError):
+        pytest_gee.utils.check_serialized(graph, path, request)
+
+
+def test_compare_arrays():
+    """Test the band by band tolerances of the array comparison."""
+    dtype = [("B1", "f8"), ("B2", "i4")]
+    expected = np.array([[(1.0, 10), (2.0, 20)]], dtype=dtype)
+    obtained = np.array([[(1.0, 11), (2.0 + 1e-9, 20)]], dtype=dtype)
+
+    with pytest.raises(AssertionError, match="B2: 1 of 2 pixels differ"):
+        compare_arrays(obtained, expected)
+    compare_arrays(obtained, expected, tolerances={"B2": {"atol": 1}})
+
+
+def test_dump_pages():
+    """Test that the pages of a collection are written as the whole collection would be."""
+    gdf = gpd.GeoDataFrame(
+        {"a": [1.5, 2.0, 3.5]}, geometry=gpd.points_from_xy([0, 1, 2], [0, 1, 2])
+    )
+    options = dict(default_flow_style=False, allow_unicode=True, indent=2, encoding="utf-8")
+    expected = yaml.dump(gdf.to_geo_dict(), Dumper=RegressionYamlDumper, **options)
+
+    stream = io.BytesIO()
+    dump_pages((gdf.iloc[i : i + 2].to_geo_dict() for i in range(0, 3, 2)), stream)
+    assert stream.getvalue() == expected
+
+
+def test_paginated_tolerances():
+    """Test that the tolerances are refused in paginated mode as the pages are compared exactly."""
+    check = FeatureCollectionFixture.check
+    for tolerance in ({"rtol": 0.1}, {"atol": 0.1}, {"hausdorff": 1.0}):
+        with pytest.raises(ValueError, match="without tolerances"):
+            check(SimpleNamespace(), _FakeObject(1), page_size=10, **tolerance)
+
+
+def test_compare_data():
+    """Test that only the mismatching paths are reported."""
+    expected = flatten_data({"a": [1.0, 2.0], "b": {"c": "x", "d": []}})
+    obtained = flatten_data({"a": [1.0000001, 2.1], "b": {"c": "y", "d": []}, "e": True})
+
+    errors = compare_data(obtained, expected, atol=1e-6)
+    assert errors == ["/e: not in the expected data", "/a/1: 2.1 != 2.0", "/b/c: 'y' != 'x'"]
+
+
+def test_compare_features():
+    """Test the geometry and property comparison of 2 GeoDataFrames."""
+    geometry = gpd.points_from_xy([0, 1], [0, 1])
+    expected = gpd.GeoDataFrame({"a": [1.0, 2.0], "b": ["x", "y"]}, geometry=geometry)
+    obtained = expected.copy()
+    obtained.geometry = obtained.translate(xoff=0.01)
+    obtained.loc[1, "a"] = 2.5
+
+    errors = compare_features(obtained, expected, atol=1e-3)
+    assert errors == [
+        "/features/0/geometry: POINT (0.01 0) != POINT (0 0)",
+        "/features/1/geometry: POINT (1.01 1) != POINT (1 1)",
+        "/features/1/properties/a: 2.5 != 2.0",
+    ]
+    assert compare_features(obtained, expected, atol=1, hausdorff=0.1) == []
+
+
+def test_check_features_parquet(data_regression, tmp_path):
+    """Test that the features are written in GeoParquet and read back with the same tolerances."""
+    pytest.importorskip("pyarrow")
+    geometry = gpd.points_from_xy([0.123, 1], [0, 1])
+    gdf = gpd.GeoDataFrame({"a": [1.0001234, 2.0], "b": ["x", "y"]}, geometry=geometry)
+    path = tmp_path / "features.parquet"
+
+    # the first check writes the rounded reference file
+    with pytest.raises(pytest.fail.Exception, match="File not found in data directory"):
+        check_features(data_regression, gdf, path, prescision=3, format="parquet")
+    assert list(gpd.read_parquet(path)["a"]) == [1.0, 2.0]
+    check_features(data_regression, gdf, path, prescision=3, format="parquet")
+
+    changed = gdf.copy()
+    changed.loc[1, "a"] = 2.5
+    with pytest.raises(AssertionError) as error:
+        check_features(data_regression, changed, path, prescision=3, format="parquet")
+    assert "/features/1/properties/a: 2.5 != 2.0" in str(error.value)
+    check_features(data_regression, changed, path, prescision=3, atol=1, format="parquet")
+
+
+def test_plugin_import_time():
+    """Test that loading the plugin does not import earthengine or the fixture dependencies."""
+    command = [sys.executable, "-X", "importtime", "-c", "import pytest_gee.plugin"]
+    result = subprocess.run(command, capture_output=True, text=True, check=True)
+    imported = {line.split("|")[-1].strip() for line in result.stderr.splitlines()}
+    heavy = {"ee", "geopandas", "numpy", "pytest_regressions", "requests", "httplib2"}
+    assert imported & heavy == set()
+
+
+def test_share_access_token(tmp_path, monkeypatch):
+    """Test that the access token is refreshed once and reused by the next sessions."""
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+
+    class Credentials:
+        refreshed = 0
+        token = expiry = None
+
+        def refresh(self, request):
+            Credentials.refreshed += 1
+            self.token = "token"
+            self.expiry = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+            self.expiry += datetime.timedelta(hours=1)
+
+    first = pytest_gee.utils.share_access_token(Credentials(), "secret")
+    second = pytest_gee.utils.share_access_token(Credentials(), "secret")
+    assert Credentials.refreshed == 1
+    assert (second.token, second.expiry) == (first.token, first.expiry)
+    assert "secret" not in "".join(p.name for p in (tmp_path / "pytest-gee").iterdir())
+
+
+def test_pooled_http():
+    """Test that the transport answers like httplib2 and leaves the failed responses to the client."""
+    statuses = [503, 200]
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            self.send_response(statuses.pop(0))
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(b"{}")
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        transport = PooledHttp(retries=2, backoff=0)
+        url = f"http://127.0.0.1:{server.server_port}"
+        failed, _ = transport.request(url, "POST", body=b"{}")
+        assert statuses == [200]
+        response, content = transport.request(url, "POST", body=b"{}")
+    finally:
+        server.shutdown()
+
+    assert failed.status == 503
+    assert (response.status, response["content-type"], content) == (200, "application/json", b"{}")
+    assert statuses == []
+
+
+def test_pooled_http_quota(monkeypatch):
+    """Test that a quota exhaustion pauses the limiter and is left to the client to retry."""
+    limiter = Limiter(backoff=0.01)
+    monkeypatch.setattr("pytest_gee.transport.get_limiter", lambda: limiter)
+    statuses = [429, 200]
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(statuses.pop(0))
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        transport = PooledHttp(retries=2, backoff=0)
+        url = f"http://127.0.0.1:{server.server_port}"
+        assert transport.request(url)[0].status == 429
+        assert (statuses, limiter.streak) == ([200], 1)
+        assert transport.request(url)[0].status == 200
+        assert limiter.streak == 0
+    finally:
+        server.shutdown()
+
+
+def test_limiter():
+    """Test that the limiter bounds the requests and pauses them after a quota exhaustion."""
+    limiter = Limiter(max_requests=2, backoff=0.2)
+    in_flight, peak, lock = [0], [0], threading.Lock()
+
+    def call(_):
+        with limiter.request():
+            with lock:
+                in_flight[0] += 1
+                peak[0] = max(peak[0], in_flight[0])
+            time.sleep(0.01)
+            with lock:
+                in_flight[0] -= 1
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(call, range(16)))
+    assert peak[0] == 2
+
+    limiter.exhausted()
+    start = time.monotonic()
+    call(None)
+    assert time.monotonic() - start >= 0.2
+    assert limiter.streak == 1
+    limiter.recovered()
+    assert limiter.streak == 0
+
+
+def test_classify():
+    """Test the recognition of the Earth Engine operations from the request urls."""
+    root = "https://earthengine.googleapis.com/v1/projects/foo"
+    assert classify("POST", f"{root}/value:compute?prettyPrint=false") == "getInfo"
+    assert classify("POST", f"{root}/image:computePixels") == "getPixels"
+    assert classify("GET", f"{root}/assets/bar:listAssets") == "listAssets"
+    assert classify("POST", f"{root}/assets?assetId=bar") == "createAsset"
+    assert classify("DELETE", f"{root}/assets/bar") == "deleteAsset"
+    assert classify("GET", f"{root}/operations/ABCD") == "getTaskStatus"
+    assert classify("GET", "https://oauth2.googleapis.com/token") == "token"
+    assert classify("GET", f"{root}/algorithms") == "other"
+
+
+def _status(task_id, state, error=None):
+    """Build a task status as returned by ``ee.data.getTaskStatus``."""
+    status = {"id": task_id, "state": state}
+    if error is not None:
+        status["error_message"] = error
+    return status
+
+
+def test_wait_for_tasks_failures(monkeypatch):
+    """Test that only the pending tasks are polled and that all their failures are reported."""
+    calls = []
+    states = {
+        "A": iter(["RUNNING", "COMPLETED"]),
+        "B": iter(["RUNNING", "FAILED"]),
+        "C": iter(["RUNNING", "RUNNING", "CANCELLED"]),
+    }
+
+    def get_task_status(task_ids):
+        calls.append(list(task_ids))
+        return [_status(i, next(states[i]), "boom" if i == "B" else None) for i in task_ids]
+
+    monkeypatch.setattr(ee.data, "getTaskStatus", get_task_status)
+    monkeypatch.setattr(time, "sleep", lambda _: None)
+
+    with pytest.raises(ee.ee_exception.EEException) as e:
+        pytest_gee.utils.wait_for_tasks(["A", "B", "C"], 60, False)
+
+    assert calls == [["A", "B", "C"], ["A", "B", "C"], ["C"]]
+    assert "2 task(s) failed" in str(e.value)
+    assert "- B: boom" in str(e.value) and "- C: CANCELLED" in str(e.value)
+
+
+def test_wait_for_tasks_timeout(monkeypatch):
+    """Test that the wait stops after the timeout with the pending tasks."""
+    clock = iter(range(0, 1000, 10))
+    states = {"A": "COMPLETED", "B": "RUNNING"}
+    monkeypatch.setattr(ee.data, "getTaskStatus", lambda ids: [_status(i, states[i]) for i in ids])
+    monkeypatch.setattr(time, "time", lambda: next(clock))
+    monkeypatch.setattr(time, "sleep", lambda _: None)
+
+    with pytest.raises(TimeoutError, match="Wait for task\\(s\\) B timed out"):
+        pytest_gee.utils.wait_for_tasks(["A", "B"], 30, False)
+
+
+def test_run_exports(monkeypatch):
+    """Test that a slow task does not block the next exports and that all failures are reported."""
+    started, polled, polls = [], [], [0]
+    # the number of polls after which each task ends, with its final state
+    ends = {"A": (4, "COMPLETED"), "B": (1, "FAILED"), "C": (1, "CANCELLED")}
+
+    def start_export(content, asset_id, description):
+        started.append((content, polls[0]))
+        return type("Task", (), {"id": content})()
+
+    def get_task_status(task_ids):
+        polls[0] += 1
+        polled.append(list(task_ids))
+        return [_status(i, ends[i][1] if polls[0] >= ends[i][0] else "RUNNING") for i in task_ids]
+
+    monkeypatch.setattr(pytest_gee.utils, "_start_export", start_export)
+    monkeypatch.setattr(ee.data, "getTaskStatus", get_task_status)
+    monkeypatch.setattr(time, "sleep", lambda _: None)
+
+    exports = [(i, f"projects/foo/assets/{i}", i) for i in "ABC"]
+    with pytest.raises(ee.ee_exception.EEException) as e:
+        pytest_gee.utils._run_exports(exports, max_tasks=2)
+
+    # C is started as soon as B ends, long before A, and the finished tasks are not polled again
+    assert started == [("A", 0), ("B", 0), ("C", 1)]
+    assert all("B" not in ids for ids in polled[1:])
+    assert "- B: FAILED" in str(e.value) and "- C: CANCELLED" in str(e.value)
+
+
+def _fake_tree(monkeypatch, tree, page_size):
+    """Serve a fake asset tree through ``ee.data.listAssets`` and record the requests."""
+    requests = []
+
+    def list_assets(params):
+        requests.append(params)
+        children = tree.get(params["parent"], [])
+        start = int(params.get("pageToken", 0))
+        page = children[start : start + page_size]
+        # the children are (name, type) or (name, type, updateTime) tuples
+        keys = ("name", "type", "updateTime")
+        assets = [dict(zip(keys, child), id=child[0]) for child in page]
+        response = {"assets": assets}
+        if start + page_size < len(children):
+            response["nextPageToken"] = str(start + page_size)
+        return response
+
+    monkeypatch.setattr(ee.data, "listAssets", list_assets)
+    return requests
+
+
+ASSET_TREE = {
+    "projects/foo/assets/root": [
+        ("projects/foo/assets/root/folder", "FOLDER"),
+        ("projects/foo/assets/root/image", "IMAGE"),
+        ("projects/foo/assets/root/table", "TABLE"),
+    ],
+    "projects/foo/assets/root/folder": [
+        ("projects/foo/assets/root/folder/collection", "IMAGE_COLLECTION"),
+    ],
+    "projects/foo/assets/root/folder/collection": [
+        ("projects/foo/assets/root/folder/collection/image", "IMAGE"),
+    ],
+}
+"A fake asset tree of 3 levels, each container mapped to its (name, type) children."
+
+
+def test_iter_assets(monkeypatch):
+    """Test that every container is listed page by page and every asset is yielded once."""
+    requests = _fake_tree(monkeypatch, ASSET_TREE, page_size=2)
+
+    assets = list(pytest_gee.utils.iter_assets("projects/foo/assets/root", page_size=2))
+
+    expected = [name for children in ASSET_TREE.values() for name, _ in children]
+    assert sorted(a["name"] for a in assets) == sorted(expected)
+    # the root needs 2 pages, the second one requested with the token of the first
+    root_requests = [r for r in requests if r["parent"] == "projects/foo/assets/root"]
+    assert [r.get("pageToken") for r in root_requests] == [None, "2"]
+    assert len(requests) == 4
+
+
+def test_delete_assets(monkeypatch):
+    """Test that the levels are deleted from the most nested one and that a failure stops them."""
+    _fake_tree(monkeypatch, ASSET_TREE, page_size=2)
+    monkeypatch.setattr(ee.data, "getAsset", lambda id: {"type": "FOLDER"})
+    deleted = []
+    monkeypatch.setattr(ee.data, "deleteAsset", deleted.append)
+
+    output = pytest_gee.utils.delete_assets("projects/foo/assets/root", dry_run=False)
+
+    assert sorted(output) == sorted(deleted)
+    depths = [len(name.split("/")) for name in deleted]
+    assert depths == sorted(depths, reverse=True)
+    assert deleted[-1] == "projects/foo/assets/root"
+
+    # the parents of an asset that could not be deleted are kept
+    def fail_on_image(id):
+        if id.endswith("collection/image"):
+            raise ee.ee_exception.EEException("permission denied")
+        deleted.append(id)
+
+    deleted.clear()
+    monkeypatch.setattr(ee.data, "deleteAsset", fail_on_image)
+    with pytest.raises(ee.ee_exception.EEException, match="1 asset\\(s\\) could not be deleted"):
+        pytest_gee.utils.delete_assets("projects/foo/assets/root", dry_run=False)
+    assert deleted == []
+
+
+def _fake_assets(monkeypatch, tree):
+    """Serve a fake asset tree and answer ``ee.data.getAsset`` for the assets it contains."""
+    existing = set(tree) | {child[0] for children in tree.values() for child in children}
+
+    def get_asset(asset_id):
+        if asset_id not in existing:
+            raise ee.ee_exception.EEException(f"Asset '{asset_id}' not found.")
+        return {"name": asset_id}
+
+    monkeypatch.setattr(ee.data, "getAsset", get_asset)
+    _fake_tree(monkeypatch, tree, page_size=10)
+
+
+def test_run_cached_exports(monkeypatch):
+    """Test that the cached leaves are only copied and that a changed leaf is exported again."""
+    cache = "projects/foo/assets/cache"
+    cached = pytest_gee.utils.asset_digest(_FakeObject(1))
+    _fake_assets(monkeypatch, {cache: [(f"{cache}/{cached}", "IMAGE")]})
+    exported, copied = [], []
+    monkeypatch.setattr(pytest_gee.utils, "_run_exports", lambda e, max_tasks: exported.extend(e))
+    monkeypatch.setattr(ee.data, "copyAsset", lambda *ids: copied.append(ids))
+
+    exports = [
+        (_FakeObject(1), "projects/foo/assets/session/a", "a"),
+        (_FakeObject(2), "projects/foo/assets/session/b", "b"),
+        (_FakeObject(2), "projects/foo/assets/session/c", "c"),
+    ]
+    pytest_gee.utils._run_cached_exports(exports, cache, "prefix", max_tasks=2)
+
+    # the identical leaves are exported once and every leaf is copied from the cache
+    changed = pytest_gee.utils.asset_digest(_FakeObject(2))
+    assert changed != cached
+    assert [(c, d) for _, c, d in exported] == [
+        (f"{cache}/{changed}", f"prefix_cache_{changed[:16]}")
+    ]
+    assert sorted(copied, key=lambda c: c[1]) == [
+        (f"{cache}/{cached}", "projects/foo/assets/session/a"),
+        (f"{cache}/{changed}", "projects/foo/assets/session/b"),
+        (f"{cache}/{changed}", "projects/foo/assets/session/c"),
+    ]
+
+
+def test_prune_cache(monkeypatch):
+    """Test that the assets older than the age limit or beyond the count limit are deleted."""
+    cache = "projects/foo/assets/cache"
+    now = datetime.datetime.now(datetime.timezone.utc)
+    ages = {"recent": 0, "old": 10, "older": 20}
+    updates = {
+        n: (now - datetime.timedelta(days=d)).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+        for n, d in ages.items()
+    }
+    tree = {cache: [(f"{cache}/{name}", "IMAGE", update) for name, update in updates.items()]}
+    _fake_assets(monkeypatch, tree)
+    deleted = []
+    monkeypatch.setattr(ee.data, "deleteAsset", deleted.append)
+
+    assert pytest_gee.utils.prune_cache(cache, max_age=5) == [f"{cache}/old", f"{cache}/older"]
+    assert sorted(deleted) == [f"{cache}/old", f"{cache}/older"]
+    assert pytest_gee.utils.prune_cache(cache, max_count=2) == [f"{cache}/older"]
+    assert pytest_gee.utils.prune_cache(cache, max_age=30, max_count=3) == []
+    assert pytest_gee.utils.prune_cache("projects/foo/assets/missing", max_age=0) == []
+
+
+def test_xdist_test_folder(monkeypatch):
+    """Test that the xdist workers share a single test folder deleted by the controller."""
+    builds, deleted = [], []
+
+    def init_tree(structure, hash, root, max_tasks, cache):
+        builds.append(hash)
+        time.sleep(0.1)
+        return PurePosixPath(f"{PurePosixPath(root.as_posix())}/{hash}")
+
+    monkeypatch.setattr(pytest_gee.utils, "init_tree", init_tree)
+    monkeypatch.setattr(pytest_gee.utils, "delete_assets", lambda id, dry_run: deleted.append(id))
+    monkeypatch.setattr(pytest_gee.utils, "asset_exists", lambda id: True)
+
+    # the controller shares the same hash and coordination directory with every worker
+    controller = SimpleNamespace(
+        stash={}, getoption=lambda name: None, getini=lambda name: "", rootpath=None
+    )
+    nodes = [SimpleNamespace(config=controller, workerinput={}) for _ in range(3)]
+    for node in nodes:
+        pytest_gee.plugin.pytest_configure_node(node)
+    shared_dir = Path(nodes[0].workerinput["gee_shared_dir"])
+    assert all(node.workerinput == nodes[0].workerinput for node in nodes)
+
+    # the first worker requesting the folder builds it, the others wait for it under the lock
+    def worker_folder(node):
+        config = SimpleNamespace(workerinput=node.workerinput)
+        gee_hash = pytest_gee.plugin.gee_hash.__wrapped__(config)
+        root = Path("projects/foo/assets")
+        fixture = pytest_gee.plugin.gee_test_folder.__wrapped__(gee_hash, root, {}, None, config)
+        return next(fixture)
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        folders = list(executor.map(worker_folder, nodes))
+
+    assert len(builds) == 1
+    assert folders == [PurePosixPath(f"projects/foo/assets/{builds[0]}")] * 3
+
+    # the controller deletes the folder and the coordination directory at the end of the session
+    pytest_gee.plugin.pytest_sessionfinish(SimpleNamespace(config=controller))
+    assert deleted == [f"projects/foo/assets/{builds[0]}"]
+    assert not shared_dir.exists()
+
+
+class _FakeObject:
+    """An Earth Engine object stand-in serialized without initializing the API."""
+
+    def __init__(self, value):
+        self.value = value
+
+    def serialize(self):
+        return json.dumps({"result": "0", "values": {"0": {"constantValue": self.value}}})
+
+    def getInfo(self):
+        raise AssertionError("no request should be sent to Earth Engine")
+
+
+class _FakeImage(_FakeObject):
+    """An image stand-in recording the server-side computation built from it."""
+
+    def __init__(self, calls):
+        super().__init__(len(calls))
+        self.calls = calls
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+
+        def method(*args, **kwargs):
+            self.calls.append((name, kwargs))
+            return _FakeImage(self.calls)
+
+        return method
+
+
+@pytest.mark.parametrize("viz_params", [None, {"min": 0, "max": 10}])
+def test_image_visualization(tmp_path, monkeypatch, viz_params):
+    """Test that the thumbnail is rendered with a single request, with or without viz params."""
+    from PIL import Image
+
+    from pytest_gee.image_regression import ImageFixture
+
+    # the Earth Engine constructors used to stretch the image are recorded without the API
+    calls, requests = [], []
+    for name in ("Algorithms", "Image", "Reducer"):
+        monkeypatch.setattr(ee, name, _FakeImage(calls))
+    monkeypatch.setattr(ee, "Number", _FakeImage(calls).Number)
+    monkeypatch.setattr(ee, "String", _FakeImage(calls).String)
+    png = io.BytesIO()
+    Image.new("RGB", (2, 2)).save(png, "PNG")
+    monkeypatch.setattr(ee.data, "computePixels", lambda p: requests.append(p) or png.getvalue())
+
+    config = SimpleNamespace(
+        stash={CASSETTE_KEY: Cassette(tmp_path)},
+        getini=lambda name: "files",
+        getoption=lambda name: False,
+    )
+    request = SimpleNamespace(config=config, node=SimpleNamespace(cls=None, name="test_image"))
+    fixture = ImageFixture(tmp_path, tmp_path, request)
+    with pytest.raises(pytest.fail.Exception, match="File not found in data directory"):
+        fixture.check(_FakeImage(calls), fullpath=tmp_path / "thumbnail.png", viz_params=viz_params)
+
+    # the image is stretched and rescaled in the requested graph, nothing else is fetched
+    assert len(requests) == 1 and requests[0]["fileFormat"] == "PNG"
+    names = [name for name, _ in calls]
+    assert names[-1] == "clipToBoundsAndScale"
+    if viz_params is None:
+        assert "reduceRegion" in names and ("visualize", {"min": 0, "max": 1}) in calls
+    else:
+        assert "reduceRegion" not in names and ("visualize", viz_params) in calls
+
+
+def test_serialized_store(tmp_path):
+    """Test the registration of the serialized graphs in the sqlite store."""
+    config = SimpleNamespace(getini=lambda name: "sqlite", getoption=lambda name: False)
+    request = SimpleNamespace(config=config)
+    path = tmp_path / "serialized_test.yml"
+    graph = pytest_gee.utils.SerializedGraph(_FakeObject(1))
+
+    # an unregistered graph is a miss, a registered one a hit
+    with pytest.raises(AssertionError):
+        pytest_gee.utils.check_serialized(graph, path, request)
+    pytest_gee.utils.check_serialized(graph, path, request, force_regen=True)
+    pytest_gee.utils.check_serialized(_FakeObject(1), path, request)
+    assert not path.exists()
+
+    # the graphs are stored in a single file of the directory and replaced in place
+    store = pytest_gee.utils.SerializedStore(tmp_path)
+    assert store.get(path.name) == graph.digest
+    other = pytest_gee.utils.SerializedGraph(_FakeObject(2))
+    store.put(path.name, other)
+    assert store.get(path.name) == other.digest
+    with pytest.raises(AssertionError):
+        pytest_gee.utils.check_serialized(graph, path, request)
+
+    pytest_gee.utils.delete_serialized(path, request)
+    assert store.get(path.name) is None
+    assert [p.name for p in tmp_path.iterdir()] == ["serialized.sqlite"]
+
+
+def test_cassette_init_requests(tmp_path):
+    """Test that the initialization responses are recorded and replayed for any project."""
+    url = "https://earthengine.googleapis.com/v1/projects/{}/algorithms?prettyPrint=false"
+    response = (200, {"Content-Type": "application/json", "Set-Cookie": "secret"}, b"{}")
+
+    recorder = Cassette(tmp_path, "record")
+    assert recorder.records(url.format("foo"))
+    assert not recorder.records("https://earthengine.googleapis.com/v1/projects/foo/value:compute")
+    recorder.fetch_request("GET", url.format("foo"), lambda: response)
+
+    def offline():
+        raise AssertionError("no request should be sent in replay mode")
+
+    player = Cassette(tmp_path, "replay")
+    status, headers, content = player.fetch_request("GET", url.format("bar"), offline)
+    assert (status, headers, content) == (200, {"Content-Type": "application/json"}, b"{}")
+    with pytest.raises(RuntimeError, match="run with --gee-record"):
+        player.fetch_request("GET", url.format("bar") + "&alt=json", offline)
+
+
+def test_deferred_replay(tmp_path):
+    """Test that the deferred checks are replayed one by one, whatever the batch they are in."""
+    recorder = Cassette(tmp_path, "record")
+    recorder.save(recorder.key(_FakeObject(1)), 1)
+    recorder.save(recorder.key(_FakeObject(2)), 2)
+
+    config = SimpleNamespace(stash={CASSETTE_KEY: Cassette(tmp_path, "replay")})
+    batch, results = DeferredBatch(), []
+    batch.add("test_a", _FakeObject(2), results.append)
+    batch.add("test_b", _FakeObject(3), results.append)
+    batch.resolve(config)
+
+    assert results == [2]
+    assert list(batch.failures) == ["test_b"]
+    assert "run with --gee-record" in str(batch.failures["test_b"][0])
+
+
+class _LiveObject(_FakeObject):
+    """An object stand-in fetched without calling Earth Engine."""
+
+    def getInfo(self):
+        return self.value
+
+
+class _BrokenObject(_FakeObject):
+    """An object stand-in that cannot be serialized."""
+
+    def serialize(self):
+        raise ee.EEException("broken graph")
+
+
+def test_deferred_errors(tmp_path, monkeypatch):
+    """Test that an error while building the batch only fails the checks it concerns."""
+
+    def broken_list(objects):
+        raise ee.EEException("the batch cannot be built")
+
+    monkeypatch.setattr(ee, "List", broken_list)
+    config = SimpleNamespace(stash={CASSETTE_KEY: Cassette(tmp_path)})
+    batch, results = DeferredBatch(), []
+    batch.add("test_a", _LiveObject(1), results.append)
+    batch.add("test_b", _BrokenObject(2), results.append)
+    batch.add("test_c", _LiveObject(3), results.append)
+    batch.resolve(config)
+
+    assert results == [1, 3]
+    assert list(batch.failures) == ["test_b"]
+    assert batch.checks == []
+
+
+class _CountedObject(_LiveObject):
+    """A fetchable object stand-in counting its serializations."""
+
+    serialized = 0
+
+    def serialize(self):
+        self.serialized += 1
+        return super().serialize()
+
+
+def test_deferred_serialized_once(tmp_path, monkeypatch):
+    """Test that the deferred checks reuse the graph of their fixture for the cassette key."""
+    monkeypatch.setattr(ee, "List", lambda objects: _LiveObject([o.value for o in objects]))
+    config = SimpleNamespace(stash={CASSETTE_KEY: Cassette(tmp_path, "record")})
+    object = _CountedObject(1)
+    graph = pytest_gee.utils.SerializedGraph(object)
+    batch, results = DeferredBatch(), []
+    batch.add("test_a", object, results.append, graph)
+    batch.resolve(config)
+
+    assert results == [1]
+    assert object.serialized == 1
+    player = Cassette(tmp_path, "replay")
+    assert player.load(player.key(_FakeObject(1))) == 1
+
+
+class _AsyncFixture(DeferrableFixture):
+    """A regression fixture stand-in comparing the fetched values with the expected ones."""
+
+    def __init__(self, request):
+        super().__init__()
+        self.request = request
+
+    def check(self, value, expected):
+        def compare(data):
+            assert data == expected, f"{data} != {expected}"
+
+        self._dispatch(_LiveObject(value), compare)
+
+
+def test_check_async(tmp_path):
+    """Test that the asynchronous checks are compared together and all their failures reported."""
+    config = SimpleNamespace(stash={CASSETTE_KEY: Cassette(tmp_path)}, getini=lambda name: "2")
+    fixture = _AsyncFixture(SimpleNamespace(config=config))
+    try:
+        futures = [fixture.check_async(1, 1), fixture.check_async(2, 2)]
+        fixture.wait()
+        assert [future.result() for future in futures] == [1, 2]
+
+        fixture.check_async(1, 1)
+        fixture.check_async(2, 3)
+        with pytest.raises(AssertionError, match="2 != 3"):
+            fixture.wait()
+
+        fixture.check_async(1, 0)
+        fixture.check_async(2, 3)
+        with pytest.raises(pytest.fail.Exception) as error:
+            fixture.wait()
+        assert "1 != 0" in str(error.value) and "2 != 3" in str(error.value)
+        assert fixture._pending == []
+    finally:
+        config.stash[EXECUTOR_KEY].shutdown()
+
+
+def test_check_async_report(tmp_path):
+    """Test that the asynchronous mismatches fail the call of the test and not its teardown."""
+    config = SimpleNamespace(stash={CASSETTE_KEY: Cassette(tmp_path)}, getini=lambda name: "2")
+    fixture = _AsyncFixture(SimpleNamespace(config=config))
+    item = SimpleNamespace(funcargs={"ee_list_regression": fixture, "other": 1})
+    try:
+        fixture.check_async(1, 1)
+        fixture.check_async(2, 3)
+        report = SimpleNamespace(outcome="passed", passed=True, longrepr=None)
+        _compare_pending(item, report)
+        assert report.outcome == "failed" and "2 != 3" in report.longrepr
+
+        # the teardown has nothing left to compare
+        fixture.wait()
+    finally:
+        config.stash[EXECUTOR_KEY].shutdown()
+
+
+DEFERRED_TESTS = """
+import json
+
+from pytest_gee.deferred import DEFERRED_KEY
+
+
+class Object:
+    def __init__(self, value):
+        self.value = value
+
+    def serialize(self):
+        return json.dumps({"result": "0", "values": {"0": {"constantValue": self.value}}})
+
+    def getInfo(self):
+        return self.value
+
+
+def defer(request, value, expected):
+    def compare(data):
+        assert data == expected
+
+    request.config.stash[DEFERRED_KEY].add(request.node.nodeid, Object(value), compare)
+
+
+def test_a(request):
+    defer(request, 1, 2)
+
+
+def test_b():
+    assert False
+
+
+def test_c(request):
+    defer(request, 1, 1)
+"""
+"A test module whose deferred checks are only resolved at its end."
+
+
+def test_deferred_early_stop(tmp_path):
+    """Test that the deferred checks are still reported when the session stops early."""
+    (tmp_path / "pytest.ini").write_text("[pytest]\n")
+    (tmp_path / "test_deferred.py").write_text(DEFERRED_TESTS)
+    command = [sys.executable, "-m", "pytest", "-p", "no:cacheprovider", "-rA", "--gee-deferred"]
+    result = subprocess.run([*command, "-x"], cwd=tmp_path, capture_output=True, text=True)
+    assert "FAILED test_deferred.py::test_a" in result.stdout
+    assert "test_deferred.py::test_c" not in result.stdout
+
+
+def test_background_init(monkeypatch):
+    """Test that the init method runs in a thread and that its error reaches the waiting fixtures."""
+    threads = []
+    monkeypatch.setattr(pytest_gee, "init_ee_from_token", lambda: threads.append("token"))
+    monkeypatch.setattr(
+        pytest_gee,
+        "init_ee_from_service_account",
+        lambda: threads.append(threading.current_thread().name),
+    )
+
+    background = BackgroundInit("service_account")
+    assert not background.started
+    background.start()
+    background.wait()
+    assert threads == ["pytest-gee-init"]
+
+    def broken():
+        raise ee.EEException("invalid credentials")
+
+    # the init is started by the first waiting fixture if no test started it
+    monkeypatch.setattr(pytest_gee, "init_ee_from_token", broken)
+    background = BackgroundInit("token")
+    config = SimpleNamespace(stash={INIT_KEY: background})
+    with pytest.raises(ee.EEException, match="invalid credentials"):
+        pytest_gee.plugin.gee_init.__wrapped__(config)
+    assert background.started
+
+    with pytest.raises(ValueError, match="gee_init should be one of"):
+        BackgroundInit("cassette")
+
+
+def test_background_init_start(monkeypatch):
+    """Test that the initialization is only started by the collection of a test using Earth Engine."""
+    started = []
+    monkeypatch.setattr(BackgroundInit, "start", lambda self: started.append(self))
+    background = BackgroundInit("token")
+
+    def collect(fixturenames, collectonly=False):
+        option = SimpleNamespace(collectonly=collectonly)
+        config = SimpleNamespace(stash={INIT_KEY: background}, option=option)
+        pytest_itemcollected(SimpleNamespace(config=config, fixturenames=fixturenames))
+
+    collect(["tmp_path"])
+    collect(["ee_list_regression", "gee_init"], collectonly=True)
+    assert started == []
+    collect(["ee_list_regression", "gee_init"])
+    assert started == [background]
+
+
+def test_check_text_lines(tmp_path):
+    """Test the streamed comparison of the text files, reporting the first different line."""
+    expected = tmp_path / "expected.yml"
+    expected.write_text("a: 1\nb: 2\nc: 3\n")
+    obtained = tmp_path / "obtained.yml"
+
+    obtained.write_text("a: 1\nb: 2\nc: 3\n")
+    check_text_lines(obtained, expected)
+
+    obtained.write_text("a: 1\nb: 5\nc: 3\n")
+    with pytest.raises(AssertionError) as error:
+        check_text_lines(obtained, expected)
+    assert "at line 2:\nexpected: 'b: 2\\n'\nobtained: 'b: 5\\n'" in str(error.value)
+
+    obtained.write_text("a: 1\nb: 2\n")
+    with pytest.raises(AssertionError) as error:
+        check_text_lines(obtained, expected)
+    assert "at line 3:\nexpected: 'c: 3\\n'\nobtained: end of file" in str(error.value)
+
+
+def test_lazy_exports():
+    """Test that the names exported by the package are still importable from it."""
+    from pytest_gee import wait_for_task
+
+    assert wait_for_task is pytest_gee.utils.wait_for_task
+
+
+def test_recorder_attribution():
+    """Test that the calls are shared by the attributed tests and the serializations kept apart."""
+    recorder = Recorder()
+    recorder.current = "test_a"
+    recorder.record("getInfo", 1.0, 100)
+    recorder.serialization(0.5, 1000)
+    with recorder.attribute("test_a", "test_b", "test_b", "test_c"):
+        recorder.record("getInfo", 4.0, 400)
+
+    a, b, c = (recorder.pop(nodeid) for nodeid in ("test_a", "test_b", "test_c"))
+    assert a["calls"]["getInfo"] == {"count": 1.25, "seconds": 2.0, "bytes": 200}
+    assert b["calls"]["getInfo"] == {"count": 0.5, "seconds": 2.0, "bytes": 200}
+    assert c["calls"]["getInfo"] == {"count": 0.25, "seconds": 1.0, "bytes": 100}
+    assert a["serialize"] == {"count": 1, "seconds": 0.5, "bytes": 1000}
+
+    total = summarize({"test_a": a, "test_b": b, "test_c": c})
+    assert total["calls"]["getInfo"] == {"count": 2, "seconds": 5.0, "bytes": 500}
+    assert total["serialize"]["bytes"] == 1000